@@ -0,0 +1,285 @@
+"""
+Local fake real-estate portal for offline benchmarks.
+Serves synthetic listing pages at /listing/{n} with a Danish-style title and
+photo gallery: eager and lazy-loaded photos, exact and resized duplicates,
+mostly-white and square decoys, and optional slow responses. Every image is
+generated once from a seed and counted in the served byte totals. Images carry
+an ETag and Last-Modified and are answered with 304 Not Modified when a
+request's If-None-Match or If-Modified-Since still matches.
+
+Usage: python benchmarks/fake_portal.py [--port 8800] [--listings 40]
+"""
+import argparse
+import hashlib
+import random
+import sys
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+STREETS = ['Karisevej', 'Strandvejen', 'Bøgeallé', 'Møllebakken', 'Skovbrynet', 'Kirkestræde']
+TOWNS = ['Druestrup', 'Hillerød', 'Silkeborg', 'Skanderborg', 'Næstved', 'Hornbæk']
+
+# Gallery photos are loaded lazily by this script once they scroll into view
+_LAZY_SCRIPT = """
+const observer = new IntersectionObserver(entries => entries.forEach(entry => {
+    if (!entry.isIntersecting) return;
+    entry.target.src = entry.target.dataset.src;
+    observer.unobserve(entry.target);
+}));
+document.querySelectorAll('img[data-src]').forEach(img => observer.observe(img));
+"""
+
+class PortalConfig:
+    """Shape of the synthetic listings; the defaults resemble a typical listing"""
+
+    def __init__(self, listings=40, images=8, image_size=(1200, 800), lazy=3, duplicates=1,
+                 decoys=True, image_delay=0.0, page_delay=0.0, seed=1):
+        self.listings = listings
+        self.images = images            # distinct photos per listing
+        self.image_size = image_size
+        self.lazy = lazy                # photos below the fold, loaded on scroll
+        self.duplicates = duplicates    # exact and resized copies of the first photo
+        self.decoys = decoys            # one mostly-white and one square image
+        self.image_delay = image_delay  # seconds before each image response
+        self.page_delay = page_delay    # seconds before each listing page
+        self.seed = seed
+
+def listing_title(n):
+    rng = random.Random(n)
+    return f"Villa - {rng.choice(STREETS)} {rng.randint(1, 200)}, {rng.randint(1000, 9990)} {rng.choice(TOWNS)} | fakebolig"
+
+def _noise(rng, width, height, base, spread):
+    """Reproducible grayscale noise with values from base to base + spread"""
+    return Image.frombytes('L', (width, height), rng.randbytes(width * height)).point(
+        lambda value: base + value * spread // 256)
+
+@lru_cache(maxsize=1024)
+def render_photo(seed, width, height):
+    """A noisy JPEG with random shapes, unique per seed and well above the 120KB filter"""
+    rng = random.Random(str(seed))
+    img = _noise(rng, width, height, 96, 64).convert('RGB')
+    draw = ImageDraw.Draw(img, 'RGBA')
+    for _ in range(12):
+        x, y = rng.randrange(width), rng.randrange(height)
+        box = (x, y, x + rng.randint(width // 8, width // 2), y + rng.randint(height // 8, height // 2))
+        color = tuple(rng.randrange(256) for _ in range(3)) + (170,)
+        (draw.ellipse if rng.random() < 0.5 else draw.rectangle)(box, fill=color)
+    buffer = BytesIO()
+    img.save(buffer, 'JPEG', quality=95)
+    return buffer.getvalue()
+
+@lru_cache(maxsize=64)
+def render_white(width, height):
+    """A mostly-white image that still passes the size filter"""
+    img = _noise(random.Random('white'), width, height, 244, 11).convert('RGB')
+    ImageDraw.Draw(img).rectangle((0, height * 3 // 4, width, height), fill=(90, 90, 90))
+    buffer = BytesIO()
+    img.save(buffer, 'JPEG', quality=98)
+    return buffer.getvalue()
+
+@lru_cache(maxsize=256)
+def resized_copy(seed, width, height):
+    """The same photo re-encoded at 3/4 size, a near-duplicate for the perceptual filter"""
+    img = Image.open(BytesIO(render_photo(seed, width, height)))
+    buffer = BytesIO()
+    img.resize((width * 3 // 4, height * 3 // 4), Image.Resampling.LANCZOS).save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+def render_listing(config, n):
+    """HTML of listing n with its gallery"""
+    width, height = config.image_size
+    eager = max(0, config.images - config.lazy)
+    parts = [f'<!doctype html><html><head><meta charset="utf-8"><title>{listing_title(n)}</title>',
+             '<style>img { display: block; width: 900px; height: 600px; margin: 8px 0; }'
+             ' .square { width: 700px; height: 700px; } .spacer { height: 3000px; }</style></head><body>',
+             '<img src="/static/logo.png" style="width: 120px; height: 40px">']
+    for i in range(eager):
+        parts.append(f'<img src="/img/{n}/{i}.jpg" alt="">')
+    for _ in range(config.duplicates):
+        parts.append(f'<img src="/img/{n}/0.jpg?copy=1" alt="">')
+        parts.append(f'<img src="/img/{n}/0_small.jpg" alt="">')
+    if config.decoys:
+        parts.append(f'<img src="/img/{n}/white.jpg" alt="">')
+        parts.append(f'<img class="square" src="/img/{n}/square.jpg" alt="">')
+    if config.lazy:
+        parts.append('<div class="spacer"></div>')
+        for i in range(eager, config.images):
+            parts.append(f'<img data-src="/img/{n}/{i}.jpg" alt="">')
+        parts.append(f'<script>{_LAZY_SCRIPT}</script>')
+    parts.append('</body></html>')
+    return ''.join(parts).encode('utf-8')
+
+def render_image(config, n, name):
+    """Bytes of one image of listing n, None for unknown names"""
+    width, height = config.image_size
+    stem = name.split('.')[0]
+    if stem == 'white':
+        return render_white(width, height)
+    if stem == 'square':
+        return render_photo((config.seed, n, 'square'), height, height)
+    if stem.endswith('_small'):
+        return resized_copy((config.seed, n, int(stem[:-len('_small')])), width, height)
+    if stem.isdigit() and int(stem) < config.images:
+        return render_photo((config.seed, n, int(stem)), width, height)
+    return None
+
+def not_modified(headers, etag, last_modified):
+    """
+    Whether a conditional request still matches the current validators.
+    If-None-Match takes precedence over If-Modified-Since, as in RFC 9110.
+    """
+    if_none_match = headers.get('If-None-Match')
+    if if_none_match:
+        tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        return '*' in tags or etag in tags
+    if_modified_since = headers.get('If-Modified-Since')
+    if if_modified_since:
+        try:
+            return parsedate_to_datetime(if_modified_since).timestamp() >= last_modified
+        except (TypeError, ValueError):
+            return False
+    return False
+
+class _QuietServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer that does not print a traceback when a client drops a connection"""
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+class PortalServer:
+    """
+    ThreadingHTTPServer serving the fake portal on 127.0.0.1.
+    Counts requests and bytes served per kind (page/image) for the reports.
+    The images never change while the server runs, so their Last-Modified is
+    the server's start time and their ETag a hash of the content.
+    """
+
+    def __init__(self, config, port=0):
+        self.config = config
+        self.stats = {'page_requests': 0, 'page_bytes': 0, 'image_requests': 0, 'image_bytes': 0, 'head_requests': 0,
+                      'not_modified': 0}
+        self.started = int(time.time())
+        self._lock = threading.Lock()
+        portal = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, like the real portals' CDNs
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_HEAD(self):
+                self.respond(head=True)
+
+            def do_GET(self):
+                self.respond(head=False)
+
+            def respond(self, head):
+                kind, body, content_type = portal.route(self.path.split('?')[0])
+                if body is None:
+                    self.send_error(404)
+                    return
+                delay = portal.config.page_delay if kind == 'page' else portal.config.image_delay
+                if delay and not head:
+                    time.sleep(delay)
+                if kind == 'image':
+                    etag = f'"{hashlib.md5(body).hexdigest()}"'
+                    if not_modified(self.headers, etag, portal.started):
+                        self.send_response(304)
+                        self.send_header('ETag', etag)
+                        self.end_headers()
+                        portal.count('not_modified', 1)
+                        return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                if kind == 'image':
+                    self.send_header('ETag', etag)
+                    self.send_header('Last-Modified', formatdate(portal.started, usegmt=True))
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if head:
+                    portal.count('head_requests', 1)
+                    return
+                self.wfile.write(body)
+                portal.count(f'{kind}_requests', 1)
+                portal.count(f'{kind}_bytes', len(body))
+
+        self.httpd = _QuietServer(('127.0.0.1', port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    def route(self, path):
+        """(kind, body, content type) for a request path, body None if unknown"""
+        parts = path.strip('/').split('/')
+        if len(parts) == 2 and parts[0] == 'listing' and parts[1].isdigit() and int(parts[1]) < self.config.listings:
+            return 'page', render_listing(self.config, int(parts[1])), 'text/html; charset=utf-8'
+        if len(parts) == 3 and parts[0] == 'img' and parts[1].isdigit():
+            return 'image', render_image(self.config, int(parts[1]), parts[2]), 'image/jpeg'
+        if path == '/static/logo.png':
+            buffer = BytesIO()
+            Image.new('RGB', (120, 40), (20, 60, 120)).save(buffer, 'PNG')
+            return 'image', buffer.getvalue(), 'image/png'
+        return 'page', None, 'text/plain'
+
+    def count(self, key, amount):
+        with self._lock:
+            self.stats[key] += amount
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def listing_urls(self):
+        return [f'{self.base_url}/listing/{n}' for n in range(self.config.listings)]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def add_portal_arguments(parser):
+    """Command line options shared by the portal and the benchmark"""
+    parser.add_argument('--listings', type=int, default=40, help='number of listing pages (default: 40)')
+    parser.add_argument('--images', type=int, default=8, help='distinct photos per listing (default: 8)')
+    parser.add_argument('--image-size', default='1200x800', help='photo size WxH (default: 1200x800)')
+    parser.add_argument('--lazy', type=int, default=3, help='photos loaded lazily below the fold (default: 3)')
+    parser.add_argument('--duplicates', type=int, default=1, help='duplicate copies of the first photo (default: 1)')
+    parser.add_argument('--no-decoys', action='store_true', help='leave out the white and square decoy images')
+    parser.add_argument('--image-delay', type=float, default=0.0, help='seconds before each image response')
+    parser.add_argument('--page-delay', type=float, default=0.0, help='seconds before each listing page')
+
+def config_from_args(args):
+    width, height = (int(value) for value in args.image_size.lower().split('x'))
+    return PortalConfig(listings=args.listings, images=args.images, image_size=(width, height),
+                        lazy=min(args.lazy, args.images), duplicates=args.duplicates,
+                        decoys=not args.no_decoys, image_delay=args.image_delay, page_delay=args.page_delay)
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the fake real-estate portal')
+    parser.add_argument('--port', type=int, default=8800)
+    add_portal_arguments(parser)
+    args = parser.parse_args()
+    server = PortalServer(config_from_args(args), args.port)
+    print(f"Serving {args.listings} listings at {server.base_url}/listing/0 ... /listing/{args.listings - 1}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+if __name__ == "__main__":
+    main()
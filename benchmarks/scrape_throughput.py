@@ -0,0 +1,312 @@
+"""
+End-to-end benchmark of get_webpage_screenshot against the local fake portal.
+Runs the scraper (headless Chrome included) in a temporary folder on the
+listings of benchmarks/fake_portal.py and reports URLs/minute, per-stage
+latency percentiles, bytes served by the portal and peak RSS.
+
+Stage latencies come from timing wrappers around the scraper's functions,
+so they are only collected in-process (--workers 1). Results can be stored
+in benchmarks/baselines.json and compared against an earlier commit.
+
+Usage: python benchmarks/scrape_throughput.py [--listings 40] [--workers 1]
+       python benchmarks/scrape_throughput.py --save-baseline
+       python benchmarks/scrape_throughput.py --compare [LABEL]
+"""
+import argparse
+import contextlib
+import functools
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import get_webpage_screenshot as scraper
+from run_metrics import percentile
+from fake_portal import PortalServer, add_portal_arguments, config_from_args
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+
+class StageTimer:
+    """Collects latency samples per stage from the wrapped scraper functions"""
+
+    def __init__(self):
+        self.samples = {}
+        self._lock = threading.Lock()
+        self._started = {}
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.samples.setdefault(stage, []).append(seconds)
+
+    def wrap(self, owner, name, stage):
+        original = getattr(owner, name)
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - started)
+
+        setattr(owner, name, timed)
+        return original
+
+    def start(self, key):
+        with self._lock:
+            self._started[key] = time.perf_counter()
+
+    def stop(self, key, stage):
+        with self._lock:
+            started = self._started.pop(key, None)
+        if started is not None:
+            self.record(stage, time.perf_counter() - started)
+
+def install_stage_timers(timer):
+    """Wrap the scraper's stages; returns the originals so they can be restored"""
+    originals = []
+    stages = [
+        (scraper, 'fetch_static_page', 'static fetch'),
+        (scraper, 'wait_for_page', 'readiness'),
+        (scraper, 'harvest_page_images', 'harvest'),
+        (scraper.ImageFetcher, '_download', 'download'),
+        (scraper, 'is_image_mostly_white', 'white check'),
+        (scraper, 'get_image_dhash', 'dhash'),
+    ]
+    for owner, name, stage in stages:
+        originals.append((owner, name, timer.wrap(owner, name, stage)))
+
+    # Whole URLs: the duration every finished page reports to the tracer
+    end_page = scraper.Tracer.end_page
+
+    def timed_end_page(tracer, result):
+        timer.record('URL total', result.get('duration', 0.0))
+        return end_page(tracer, result)
+
+    scraper.Tracer.end_page = timed_end_page
+    originals.append((scraper.Tracer, 'end_page', end_page))
+
+    # Page loads: driver.get of every driver the scraper creates
+    create_driver = scraper.create_chrome_driver
+
+    def create_timed_driver(*args, **kwargs):
+        driver = create_driver(*args, **kwargs)
+        timer.wrap(driver, 'get', 'page load')
+        return driver
+
+    scraper.create_chrome_driver = create_timed_driver
+    originals.append((scraper, 'create_chrome_driver', create_driver))
+
+    # Encodes: from submission until the derivatives are written (queueing included)
+    submit, write = scraper.ImageEncoder.submit, scraper.ImageEncoder._write
+
+    def timed_submit(encoder, img_content, target_size_kb, base_path, *args, **kwargs):
+        timer.start(base_path)
+        return submit(encoder, img_content, target_size_kb, base_path, *args, **kwargs)
+
+    def timed_write(encoder, outputs, base_path, label):
+        write(encoder, outputs, base_path, label)
+        timer.stop(base_path, 'encode')
+
+    scraper.ImageEncoder.submit, scraper.ImageEncoder._write = timed_submit, timed_write
+    originals += [(scraper.ImageEncoder, 'submit', submit), (scraper.ImageEncoder, '_write', write)]
+    return originals
+
+def restore(originals):
+    for owner, name, original in reversed(originals):
+        setattr(owner, name, original)
+
+def summarize_stages(samples):
+    summary = {}
+    for stage, values in samples.items():
+        values = sorted(values)
+        summary[stage] = {
+            'count': len(values),
+            'p50': percentile(values, 0.50),
+            'p90': percentile(values, 0.90),
+            'p99': percentile(values, 0.99),
+            'max': values[-1],
+        }
+    return summary
+
+def peak_rss_mb():
+    """(this process, largest child process) peak RSS in MB, None where unavailable"""
+    if resource is None:
+        return None, None
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    unit = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit)
+
+def reset_run_state(keep_cache):
+    """Remove the outputs of a previous run in the benchmark folder"""
+    for path in ['final_urls.json', 'manifest.json', 'scraper_state.db', scraper.JOURNAL_PATH]:
+        if os.path.exists(path):
+            os.remove(path)
+    shutil.rmtree('screenshots', ignore_errors=True)
+    if not keep_cache:
+        shutil.rmtree('.image_cache', ignore_errors=True)
+
+def run_scraper(urls, workers, settings, verbose):
+    with open('urls.txt', 'w', encoding='utf-8') as f:
+        f.write('\n'.join(urls) + '\n')
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(open(os.devnull, 'w'))
+    started = time.perf_counter()
+    with output:
+        scraper.get_webpage_screenshot(workers=workers, **settings)
+    return time.perf_counter() - started
+
+def count_saved_images():
+    with open('final_urls.json', 'r', encoding='utf-8') as f:
+        entries = json.load(f)['urls']
+    return sum(len(entry.get('images', [])) for entry in entries), sum(1 for entry in entries if entry.get('images'))
+
+def current_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(BASELINES_PATH), check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True,
+                               text=True, cwd=os.path.dirname(BASELINES_PATH)).stdout.strip()
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def load_baselines():
+    if not os.path.exists(BASELINES_PATH):
+        return {}
+    with open(BASELINES_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def print_report(report):
+    print(f"\n{report['urls']} URLs in {report['seconds']:.1f}s: {report['urls_per_min']:.1f} URLs/min "
+          f"({report['saved_images']} images saved for {report['urls_with_images']} URLs)")
+    served = report['served']
+    print(f"Served: {served['page_requests']} pages ({served['page_bytes'] / 1024:.0f}KB), "
+          f"{served['image_requests']} images ({served['image_bytes'] / 1024 / 1024:.1f}MB), "
+          f"{served['head_requests']} HEAD requests, {served.get('not_modified', 0)} not modified")
+    if report['peak_rss_mb'][0] is not None:
+        print(f"Peak RSS: {report['peak_rss_mb'][0]:.0f}MB this process, {report['peak_rss_mb'][1]:.0f}MB largest child")
+    if report['stages']:
+        print(f"\n  {'stage':<16}{'count':>7}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for stage, stats in report['stages'].items():
+            print(f"  {stage:<16}{stats['count']:>7}{stats['p50'] * 1000:>10.1f}{stats['p90'] * 1000:>10.1f}"
+                  f"{stats['p99'] * 1000:>10.1f}{stats['max'] * 1000:>10.1f}")
+    else:
+        print("  (stage latencies are only collected with --workers 1)")
+
+def compare(report, baseline, label, tolerance):
+    """Print the change against a stored baseline, True if throughput regressed beyond tolerance"""
+    change = report['urls_per_min'] / baseline['urls_per_min'] - 1
+    print(f"\nCompared to {label} ({baseline['commit']}, {baseline['date']}): "
+          f"{baseline['urls_per_min']:.1f} -> {report['urls_per_min']:.1f} URLs/min ({change:+.1%})")
+    for stage, stats in report['stages'].items():
+        before = baseline['stages'].get(stage)
+        if before and before['p50'] > 0:
+            print(f"  {stage:<16} p50 {before['p50'] * 1000:8.1f} -> {stats['p50'] * 1000:8.1f} ms "
+                  f"({stats['p50'] / before['p50'] - 1:+.0%})")
+    regressed = change < -tolerance
+    if regressed:
+        print(f"⚠ Throughput regressed by more than {tolerance:.0%}")
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the scraper against a local fake portal')
+    add_portal_arguments(parser)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--readiness', default=scraper.DEFAULT_SETTINGS['readiness'])
+    parser.add_argument('--scroll', action='store_true', help='scroll pages so lazy photos load')
+    parser.add_argument('--no-static', action='store_true', help='load every listing in Chrome, skipping the raw-HTML tier')
+    parser.add_argument('--cdp', action='store_true', help='capture image bytes from Chrome instead of downloading them again')
+    parser.add_argument('--encode-workers', type=int, default=scraper.DEFAULT_SETTINGS['encode_workers'])
+    parser.add_argument('--warm', action='store_true', help='measure a second run against the filled image cache')
+    parser.add_argument('--verbose', action='store_true', help='show the scraper output')
+    parser.add_argument('--keep', action='store_true', help='keep the temporary run folder')
+    parser.add_argument('--save-baseline', nargs='?', const='', metavar='LABEL',
+                        help='store the result in baselines.json (label defaults to the git commit)')
+    parser.add_argument('--compare', nargs='?', const='', metavar='LABEL',
+                        help='compare with a stored baseline (default: the latest with the same parameters)')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='allowed throughput drop before --compare fails (default: 0.10)')
+    args = parser.parse_args()
+
+    config = config_from_args(args)
+    params = {key: value for key, value in sorted(vars(args).items())
+              if key not in ('verbose', 'keep', 'save_baseline', 'compare', 'tolerance')}
+    settings = {'readiness': args.readiness, 'scroll': args.scroll, 'encode_workers': args.encode_workers}
+    if args.no_static:
+        settings['static_min_images'] = 0
+    if args.cdp:
+        settings['network_capture'] = True
+
+    server = PortalServer(config).start()
+    timer = StageTimer()
+    originals = install_stage_timers(timer)
+    workdir = tempfile.mkdtemp(prefix='scrape_bench_')
+    previous_dir = os.getcwd()
+    os.chdir(workdir)
+    try:
+        print(f"Benchmarking {config.listings} listings at {server.base_url} in {workdir}")
+        seconds = run_scraper(server.listing_urls(), args.workers, settings, args.verbose)
+        if args.warm:
+            # Measure only the second run, with the image cache of the first
+            reset_run_state(keep_cache=True)
+            timer.samples.clear()
+            for key in server.stats:
+                server.stats[key] = 0
+            seconds = run_scraper(server.listing_urls(), args.workers, settings, args.verbose)
+        saved_images, urls_with_images = count_saved_images()
+    finally:
+        os.chdir(previous_dir)
+        restore(originals)
+        server.stop()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'commit': current_commit(),
+        'date': time.strftime('%Y-%m-%d %H:%M'),
+        'params': params,
+        'urls': config.listings,
+        'seconds': seconds,
+        'urls_per_min': config.listings / seconds * 60,
+        'saved_images': saved_images,
+        'urls_with_images': urls_with_images,
+        'served': dict(server.stats),
+        'peak_rss_mb': peak_rss_mb(),
+        'stages': summarize_stages(timer.samples),
+    }
+    print_report(report)
+
+    baselines = load_baselines()
+    regressed = False
+    if args.compare is not None:
+        if args.compare:
+            label = args.compare
+        else:
+            matching = [label for label, baseline in baselines.items() if baseline['params'] == params]
+            label = matching[-1] if matching else None
+        if label not in baselines:
+            print(f"\nNo baseline {'named ' + label if label else 'with these parameters'} in {BASELINES_PATH}")
+        else:
+            regressed = compare(report, baselines[label], label, args.tolerance)
+    if args.save_baseline is not None:
+        label = args.save_baseline or report['commit']
+        baselines[label] = report
+        with open(BASELINES_PATH, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, indent=2)
+        print(f"\n✓ Saved baseline {label} to {BASELINES_PATH}")
+    if regressed:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Micro-benchmark for is_image_mostly_white.
+Compares the original per-pixel Python loop with the band/histogram
+implementation (full decode and draft decode) on the images in screenshots/.
+
+Usage: python benchmarks/white_pixels.py [folder] [--repeat N]
+"""
+import argparse
+import os
+import sys
+import time
+from io import BytesIO
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from get_webpage_screenshot import is_image_mostly_white
+
+def legacy_is_image_mostly_white(img_content):
+    """The original implementation, kept here as the reference"""
+    try:
+        img = Image.open(BytesIO(img_content))
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        pixels = list(img.getdata())
+        total_pixels = len(pixels)
+        white_pixels = 0
+        for r, g, b in pixels:
+            if r > 240 and g > 240 and b > 240:
+                white_pixels += 1
+        return (white_pixels / total_pixels) * 100 > 50
+    except:
+        return False
+
+def time_detector(detector, images, repeat):
+    """Return (best seconds for one pass over images, verdicts)"""
+    best = None
+    verdicts = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        verdicts = [detector(content) for content in images]
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, verdicts
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the white-pixel detector')
+    parser.add_argument('folder', nargs='?', default='screenshots')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    
+    names = sorted(name for name in os.listdir(args.folder)
+                   if name.lower().endswith(('.png', '.jpg', '.jpeg', '.webp')))
+    images = []
+    for name in names:
+        with open(os.path.join(args.folder, name), 'rb') as f:
+            images.append(f.read())
+    if not images:
+        print(f"No images found in {args.folder}")
+        return
+    total_pixels = sum(Image.open(BytesIO(content)).size[0] * Image.open(BytesIO(content)).size[1] for content in images)
+    print(f"{len(images)} images, {total_pixels / 1e6:.1f} megapixels, best of {args.repeat}")
+    
+    detectors = [
+        ('legacy loop', legacy_is_image_mostly_white),
+        ('bands, full decode', lambda content: is_image_mostly_white(content, draft_size=None)),
+        ('bands, draft decode', is_image_mostly_white),
+    ]
+    reference = None
+    for label, detector in detectors:
+        seconds, verdicts = time_detector(detector, images, args.repeat)
+        if reference is None:
+            reference = (seconds, verdicts)
+            agreement = ''
+        else:
+            mismatches = sum(1 for a, b in zip(reference[1], verdicts) if a != b)
+            agreement = f"  {reference[0] / seconds:6.1f}x faster, {mismatches} verdict mismatches"
+        print(f"  {label:<22} {seconds * 1000:8.1f} ms  ({seconds * 1000 / len(images):.2f} ms/image){agreement}")
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,35 @@
+import argparse
+import codecs
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from collections import Counter, deque
+from contextlib import contextmanager, redirect_stdout
 import json
+import multiprocessing
+import queue
+import re
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
 import time
 import os
 import requests
+from requests.adapters import HTTPAdapter
+import threading
 from urllib.parse import urljoin, urlparse, urlunparse
-from io import BytesIO
-from PIL import Image
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from PIL import Image, ImageChops
 import hashlib
+import itertools
+from image_cache import ImageCache
+from job_ledger import JobLedger
+from listing_keys import ListingKeyIndex, listing_key
+from host_scheduler import THROTTLE_STATUSES, HostScheduler
+from near_duplicates import NearDuplicateIndex, hamming_distance
+from network_capture import NetworkCapture, enable_network_capture, load_blocklist
+from pipeline import DepthSampler, Stage
+from snapshot_store import SnapshotStore, load_snapshot
+from run_metrics import Tracer, print_trace_summary, profile_call, rotate_trace, summarize_trace, write_prometheus
+from static_pages import parse_static_page
 
 def clean_url(url):
     """Remove query parameters and anchors from URL"""
@@ -27,8 +48,258 @@ def clean_url(url):
         cleaned = cleaned[:-1]
     return cleaned
 
+# Append-only log of per-URL results, compacted into final_urls.json
+JOURNAL_PATH = 'final_urls.journal.jsonl'
+
+# Results journaled between two compactions during a run
+JOURNAL_COMPACT_EVERY = 200
+
+# Lines of urls.txt checked against the listing key index at a time
+INGEST_BATCH = 1000
+
+# Prebuilt data for index.html: everything the viewer needs in one fetch
+MANIFEST_PATH = 'manifest.json'
+
+def write_json_atomic(path, data, **dump_options):
+    """
+    Write data as JSON to path atomically.
+    The data goes to a temp file that replaces the original with one rename,
+    so a crash mid-write never leaves a truncated file behind.
+    """
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, **dump_options)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+def save_entries(entries, path='final_urls.json'):
+    """Write the URL entries to final_urls.json atomically"""
+    write_json_atomic(path, {'urls': entries}, indent=2)
+
+def load_starred_indices(path='starred.txt'):
+    """Indices listed in starred.txt, one per line"""
+    if not os.path.exists(path):
+        return set()
+    with open(path, 'r', encoding='utf-8') as f:
+        return {int(line.strip()) for line in f if line.strip().isdigit()}
+
+def average_color(path):
+    """Average color of an image file as #rrggbb, used as the viewer placeholder"""
+    with Image.open(path) as img:
+        img.draft('RGB', (64, 64))
+        r, g, b = img.convert('RGB').resize((1, 1), Image.Resampling.BOX).getpixel((0, 0))
+    return f'#{r:02x}{g:02x}{b:02x}'
+
+def describe_legacy_images(index, names, folder='screenshots'):
+    """Image records for the {index}_{n}.png files written before the 'images' field existed"""
+    images = []
+    for n in range(1, 5):
+        name = f'{index}_{n}'
+        if f'{name}.png' not in names:
+            continue
+        try:
+            with Image.open(os.path.join(folder, f'{name}.png')) as img:
+                width, height = img.size
+        except Exception:
+            continue
+        images.append({'name': name, 'width': width, 'height': height,
+                       'thumb_width': width, 'thumb_height': height, 'formats': ['png']})
+    return images
+
+def correct_saved_images(images, folder='screenshots'):
+    """
+    Replace the planned image records of this run with what the encoder
+    wrote, in place: the size of the full-view and thumbnail JPEGs (the
+    encode may shrink an image further than planned) and the formats on
+    disk. An image without a thumbnail file is its own thumbnail. Images
+    whose encode failed are removed from the list.
+    """
+    kept = []
+    for image in images:
+        base_path = os.path.join(folder, image['name'])
+        try:
+            with Image.open(base_path + '.jpg') as img:
+                image['width'], image['height'] = img.size
+            image['thumb_width'], image['thumb_height'] = image['width'], image['height']
+            if os.path.exists(base_path + '_thumb.jpg'):
+                with Image.open(base_path + '_thumb.jpg') as img:
+                    image['thumb_width'], image['thumb_height'] = img.size
+        except Exception:
+            print(f"  Warning: {image['name']} was not written, removing it from the entry")
+            continue
+        image['formats'] = [ext for ext in IMAGE_FORMATS if os.path.exists(f'{base_path}.{ext}')]
+        kept.append(image)
+    images[:] = kept
+
+def fill_image_details(entries, folder='screenshots'):
+    """
+    Complete the image records the manifest needs, in place.
+    Entries from before the 'images' field get their records from the
+    legacy .png files, and every image whose preview file exists gets its
+    placeholder color. Both are stored in the entries, so each file is only
+    inspected once.
+    """
+    names = None
+    for index, entry in enumerate(entries):
+        if 'images' not in entry:
+            if names is None:
+                names = set(os.listdir(folder)) if os.path.isdir(folder) else set()
+            entry['images'] = describe_legacy_images(index, names, folder)
+        for image in entry['images']:
+            if 'color' in image:
+                continue
+            preview = 'png' if image['formats'] == ['png'] else 'jpg'
+            # Images no larger than a thumbnail have no _thumb files
+            suffix = '_thumb' if image['thumb_width'] < image['width'] else ''
+            path = os.path.join(folder, f"{image['name']}{suffix}.{preview}")
+            if os.path.exists(path):
+                try:
+                    image['color'] = average_color(path)
+                except Exception:
+                    pass
+
+def build_manifest(entries, path=MANIFEST_PATH):
+    """
+    Write the manifest that index.html renders from, with short keys to keep it small:
+    {"v": 1, "entries": [{"u": url, "t": title, "s": 1 if starred,
+      "i": [{"n": name, "w": width, "h": height, "tw": thumb width,
+             "th": thumb height, "c": placeholder color, "f": formats}]}]}
+    """
+    fill_image_details(entries)
+    starred = load_starred_indices()
+    manifest_entries = []
+    for index, entry in enumerate(entries):
+        item = {'u': entry['url'], 't': entry.get('title', '')}
+        if index in starred:
+            item['s'] = 1
+        item['i'] = []
+        for image in entry['images']:
+            record = {'n': image['name'], 'w': image['width'], 'h': image['height'],
+                      'tw': image['thumb_width'], 'th': image['thumb_height'], 'f': image['formats']}
+            if 'color' in image:
+                record['c'] = image['color']
+            item['i'].append(record)
+        manifest_entries.append(item)
+    write_json_atomic(path, {'v': 1, 'entries': manifest_entries}, separators=(',', ':'))
+
+def append_to_journal(record):
+    """Append one result record to the journal, the cost does not grow with the corpus"""
+    with open(JOURNAL_PATH, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        f.flush()
+
+def apply_journal_record(entries, record, positions=None):
+    """Apply one journal record to the entries; positions maps url -> index when indices may have shifted"""
+    if record.get('added'):
+        # A new entry from urls.txt; replaying it after a crash must not add it twice
+        if positions is not None and record['url'] in positions:
+            return False
+        entries.append({'url': record['url'], 'title': ''})
+        if positions is not None:
+            positions[record['url']] = len(entries) - 1
+        return True
+    index = record['index']
+    if not (0 <= index < len(entries) and entries[index].get('url') == record['url']):
+        index = positions.get(record['url']) if positions is not None else None
+        if index is None:
+            return False
+    for key in ('title', 'images'):
+        if key in record:
+            entries[index][key] = record[key]
+    return True
+
+def compact_journal(entries):
+    """Fold the journaled results into final_urls.json, rebuild the manifest and start a new journal"""
+    try:
+        build_manifest(entries)
+    except Exception as e:
+        print(f"  Warning: Could not build {MANIFEST_PATH}: {str(e)}")
+    save_entries(entries)
+    if os.path.exists(JOURNAL_PATH):
+        os.remove(JOURNAL_PATH)
+
+def recover_journal():
+    """Apply the journal left by an interrupted run to final_urls.json"""
+    if not os.path.exists(JOURNAL_PATH) or not os.path.exists('final_urls.json'):
+        return
+    applied = replay_journal()
+    print(f"✓ Recovered {applied} results from the journal of an interrupted run")
+
+def replay_journal():
+    """Fold the journal into final_urls.json; returns the number of records applied"""
+    with open('final_urls.json', 'r', encoding='utf-8') as f:
+        entries = json.load(f).get('urls', [])
+    positions = {entry['url']: index for index, entry in enumerate(entries) if isinstance(entry, dict)}
+    applied = 0
+    with open(JOURNAL_PATH, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # The last line may be cut short by the crash
+                continue
+            if apply_journal_record(entries, record, positions):
+                applied += 1
+    compact_journal(entries)
+    return applied
+
+def ingest_url_list(path='urls.txt', ledger_path='scraper_state.db'):
+    """
+    Stream a URL list into final_urls.json in batches of INGEST_BATCH lines.
+    Every URL is reduced to its listing key (see listing_keys.py) and skipped
+    if that listing is already in final_urls.json or earlier in the list, so
+    memory use stays flat however long the list is. New entries go to the
+    journal first and their keys are indexed once the batch is on disk.
+    Returns (URLs read, entries added, duplicates skipped).
+    """
+    keys = ListingKeyIndex(ledger_path)
+    if len(keys) == 0 and os.path.exists('final_urls.json'):
+        keys.seed_from_entries('final_urls.json')
+    lines = added = skipped = 0
+    with open(path, 'r', encoding='utf-8') as f:
+        while True:
+            batch = [line.strip() for line in itertools.islice(f, INGEST_BATCH)]
+            if not batch:
+                break
+            keyed = [(listing_key(url), clean_url(url)) for url in batch if url]
+            lines += len(keyed)
+            known = keys.known(key for key, _ in keyed)
+            new_urls = []
+            for key, url in keyed:
+                if key in known:
+                    skipped += 1
+                    continue
+                known.add(key)
+                new_urls.append(url)
+            if not new_urls:
+                continue
+            with open(JOURNAL_PATH, 'a', encoding='utf-8') as journal:
+                journal.write(''.join(json.dumps({'url': url, 'added': True}, ensure_ascii=False) + '\n'
+                                      for url in new_urls))
+                journal.flush()
+                os.fsync(journal.fileno())
+            keys.add_many(new_urls)
+            added += len(new_urls)
+    keys.close()
+    return lines, added, skipped
+
+def rebuild_manifest():
+    """Rebuild manifest.json from final_urls.json without scraping"""
+    recover_journal()
+    if not os.path.exists('final_urls.json'):
+        print("final_urls.json not found.")
+        return
+    with open('final_urls.json', 'r', encoding='utf-8') as f:
+        entries = json.load(f).get('urls', [])
+    compact_journal(entries)
+    print(f"✓ Wrote {MANIFEST_PATH} with {len(entries)} entries")
+
 def normalize_urls_in_json():
-    """Clean all URLs in final_urls.json and convert to new format with title field"""
+    """
+    Clean all URLs in final_urls.json and convert to new format with title field.
+    Fields such as 'images' are kept, and the file is only rewritten if something changed.
+    """
     if not os.path.exists('final_urls.json'):
         return
     
@@ -53,12 +324,12 @@ def normalize_urls_in_json():
             # New format: object with url and title
             cleaned = clean_url(item.get('url', ''))
             if cleaned and cleaned not in seen_urls:
-                normalized_entries.append({'url': cleaned, 'title': item.get('title', '')})
+                normalized_entries.append(dict(item, url=cleaned, title=item.get('title', '')))
                 seen_urls.add(cleaned)
     
     # Save back to file
-    with open('final_urls.json', 'w', encoding='utf-8') as f:
-        json.dump({'urls': normalized_entries}, f, indent=2, ensure_ascii=False)
+    if normalized_entries != urls:
+        save_entries(normalized_entries)
     
     print(f"✓ Normalized {len(normalized_entries)} URLs (removed {len(urls) - len(normalized_entries)} duplicates)")
     print()
@@ -67,27 +338,52 @@ def get_image_hash(image_content):
     """Generate a hash of the image content to detect duplicates"""
     return hashlib.md5(image_content).hexdigest()
 
-def is_image_mostly_white(img_content):
-    """Check if image has more than 50% white or near-white pixels"""
+def get_image_dhash(img_content, hash_size=8):
+    """
+    Perceptual difference hash used to spot re-encoded or resized copies.
+    Each of the 64 bits tells whether a pixel of a 9x8 grayscale version is
+    brighter than its right neighbour, so copies differ in only a few bits.
+    JPEGs are decoded at 1/8 scale instead of full resolution.
+    """
+    img = Image.open(BytesIO(img_content))
+    img.draft('L', ((hash_size + 1) * 8, hash_size * 8))
+    pixels = img.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.BOX).tobytes()
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            offset = row * (hash_size + 1) + col
+            value = (value << 1) | (pixels[offset] > pixels[offset + 1])
+    return value
+
+# Lookup table thresholding one band: 255 above the white threshold, else 0
+def _white_band_lut(threshold):
+    return [255 if value > threshold else 0 for value in range(256)]
+
+def is_image_mostly_white(img_content, threshold=240, white_ratio=0.5, draft_size=(640, 640)):
+    """
+    Check if more than white_ratio of the pixels are white or near-white
+    (all RGB values > threshold).
+    Runs on PIL band operations and a histogram instead of a Python loop over
+    the pixels. JPEGs are decoded at reduced resolution (no smaller than
+    draft_size) when draft_size is set; pass None to check every pixel.
+    """
     try:
         img = Image.open(BytesIO(img_content))
+        if draft_size:
+            img.draft('RGB', draft_size)
         
         # Convert to RGB if necessary
         if img.mode != 'RGB':
             img = img.convert('RGB')
         
-        # Get pixel data
-        pixels = list(img.getdata())
-        total_pixels = len(pixels)
-        white_pixels = 0
+        # A pixel is white when all three thresholded bands are 255
+        lut = _white_band_lut(threshold)
+        red, green, blue = (band.point(lut) for band in img.split())
+        white_mask = ImageChops.darker(ImageChops.darker(red, green), blue)
+        white_pixels = white_mask.histogram()[255]
         
-        # Count white or near-white pixels (RGB values > 240)
-        for r, g, b in pixels:
-            if r > 240 and g > 240 and b > 240:
-                white_pixels += 1
-        
-        white_percentage = (white_pixels / total_pixels) * 100
-        return white_percentage > 50
+        total_pixels = img.width * img.height
+        return white_pixels / total_pixels > white_ratio
     except:
         # If we can't check, assume it's not mostly white
         return False
@@ -102,119 +398,2044 @@ def is_image_too_square(width, height):
     # (e.g., 600x600 is 1.0, 600x500 is 1.2, 600x400 is 1.5)
     return aspect_ratio < 1.3
 
-def compress_image(img_content, target_size_kb):
-    """Compress image to target file size in KB"""
+# Typical JPEG bytes per pixel for a property photo at medium quality,
+# used to pick the output resolution from the byte budget
+JPEG_BYTES_PER_PIXEL = 0.1
+
+# Longest edge of the thumbnail shown in the viewer tiles (250px tall cards at 2x)
+THUMB_SIZE = 640
+
+# Pillow 11.2+ encodes AVIF natively, older versions need the pillow-avif-plugin
+try:
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+Image.init()
+
+# Output formats per derivative, best first: (file extension, Pillow format, default quality)
+MODERN_FORMATS = [(ext, fmt, quality) for ext, fmt, quality in [('avif', 'AVIF', 50), ('webp', 'WEBP', 75)]
+                  if fmt in Image.SAVE]
+IMAGE_FORMATS = [ext for ext, _, _ in MODERN_FORMATS] + ['jpg']
+# Every file an encode can write next to screenshots/{name}
+DERIVATIVE_SUFFIXES = [f'{kind}.{ext}' for kind in ('', '_thumb') for ext in IMAGE_FORMATS]
+
+def _encode(img, fmt, quality, optimize=False):
+    output = BytesIO()
+    if fmt == 'JPEG':
+        img.save(output, format='JPEG', quality=quality, optimize=optimize)
+    else:
+        img.save(output, format=fmt, quality=quality)
+    return output.getvalue()
+
+def _search_quality(img, target_bytes, fmt='JPEG', low=20, high=95):
+    """Binary search the highest quality that fits target_bytes, None if even low is too big"""
+    best = None
+    while low <= high:
+        quality = (low + high) // 2
+        if len(_encode(img, fmt, quality)) <= target_bytes:
+            best = quality
+            low = quality + 1
+        else:
+            high = quality - 1
+    return best
+
+def plan_output_size(width, height, target_size_kb):
+    """Pick the output resolution for an image from its byte budget"""
+    budget_pixels = target_size_kb * 1024 / JPEG_BYTES_PER_PIXEL
+    scale = min(1.0, (budget_pixels / (width * height)) ** 0.5)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+def plan_thumb_size(width, height):
+    """Thumbnail resolution for an output image, never upscaled"""
+    scale = min(1.0, THUMB_SIZE / max(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+def _decode_for_output(img_content, target_size_kb):
+    """Decode once, straight to the planned output resolution, as RGB"""
+    img = Image.open(BytesIO(img_content))
+    target_size = plan_output_size(img.width, img.height, target_size_kb)
+    
+    # Let the JPEG decoder do most of the downscaling
+    img.draft('RGB', target_size)
+    
+    # Convert RGBA to RGB if needed
+    if img.mode == 'RGBA':
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[3])
+        img = background
+    elif img.mode != 'RGB':
+        img = img.convert('RGB')
+    
+    if img.size != target_size:
+        img = img.resize(target_size, Image.Resampling.LANCZOS)
+    return img
+
+def _fit_jpeg(img, target_bytes):
+    """
+    Encode img as a JPEG of at most target_bytes.
+    Searches the quality at the current resolution and only scales down
+    further while even the lowest quality is too large.
+    Returns (jpeg bytes, the image that was encoded).
+    """
+    quality = _search_quality(img, target_bytes)
+    shrinks = 0
+    while quality is None and shrinks < 10:
+        shrink = max(0.5, min(0.9, (target_bytes / len(_encode(img, 'JPEG', 20))) ** 0.5))
+        img = img.resize((max(1, int(img.width * shrink)), max(1, int(img.height * shrink))), Image.Resampling.LANCZOS)
+        quality = _search_quality(img, target_bytes)
+        shrinks += 1
+    
+    # optimize=True only makes the file smaller, so the searched quality still fits
+    return _encode(img, 'JPEG', quality or 20, optimize=True), img
+
+def _encode_modern(img, fmt, quality, max_bytes):
+    """
+    Encode in a modern format at its default quality, lowered only if it
+    would outgrow max_bytes. None if no quality fits.
+    """
+    content = _encode(img, fmt, quality)
+    if len(content) > max_bytes:
+        fitted = _search_quality(img, max_bytes, fmt, high=quality - 1)
+        content = _encode(img, fmt, fitted) if fitted is not None else None
+    return content
+
+def encode_image_derivatives(img_content, target_size_kb):
+    """
+    Encode the derivatives shown by the viewer.
+    Returns {file suffix: bytes} with a full-view '.jpg' within the byte
+    budget and, for images larger than THUMB_SIZE, a smaller '_thumb.jpg'.
+    '.webp'/'.avif' versions are added for a format only if they are no
+    larger than the JPEG for every derivative.
+    """
+    img = _decode_for_output(img_content, target_size_kb)
+    full_jpeg, img = _fit_jpeg(img, target_size_kb * 1024)
+    derivatives = [('', img, full_jpeg)]
+    
+    # Small budgets already produce thumbnail-sized images; the viewer uses those as they are,
+    # and also the full image when a thumbnail would not save bytes
+    if max(img.size) > THUMB_SIZE:
+        thumb = img.resize(plan_thumb_size(img.width, img.height), Image.Resampling.LANCZOS)
+        thumb_jpeg = _encode(thumb, 'JPEG', 80, optimize=True)
+        if len(thumb_jpeg) < len(full_jpeg):
+            derivatives.append(('_thumb', thumb, thumb_jpeg))
+    outputs = {f'{kind}.jpg': jpeg for kind, _, jpeg in derivatives}
+    
+    # One formats list describes the image, so a format that loses to the JPEG anywhere is left out
+    for ext, fmt, quality in MODERN_FORMATS:
+        encoded = {}
+        for kind, derivative, jpeg in derivatives:
+            content = _encode_modern(derivative, fmt, quality, len(jpeg))
+            if content is None:
+                break
+            encoded[f'{kind}.{ext}'] = content
+        else:
+            outputs.update(encoded)
+    return outputs
+
+def _timed_encode(img_content, target_size_kb):
+    """encode_image_derivatives for the pool, returning the outputs and the seconds it took"""
+    started = time.perf_counter()
+    outputs = encode_image_derivatives(img_content, target_size_kb)
+    return outputs, time.perf_counter() - started
+
+class ImageEncoder:
+    """
+    Runs encode_image_derivatives in a process pool and writes the results to
+    disk. Encodes of one page overlap with loading the next URL; close()
+    blocks until every submitted image has been written. With workers=0 the
+    images are encoded inline.
+    Each encode is an 'encode' span of the page it was submitted for, with
+    the encode time in the pool and the time spent queued.
+    With max_pending, submit() blocks while that many encodes are unfinished,
+    and a writer (e.g. the pipeline's write stage) can take over the writes.
+    """
+    
+    def __init__(self, workers=2, cache=None, tracer=None, max_pending=0, writer=None):
+        self.executor = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+        self.cache = cache
+        self.tracer = tracer or Tracer()
+        self.writer = writer or self._write
+        self._slots = threading.BoundedSemaphore(max_pending) if max_pending and self.executor else None
+        self.pending = 0
+        self._lock = threading.Lock()
+    
+    def submit_cached(self, content_hash, target_size_kb, base_path, label):
+        """Write the cached derivatives for this image and budget next to base_path; False on a miss"""
+        if self.cache is None or not content_hash:
+            return False
+        with self.tracer.span('encode_cache', outcome='hit') as span:
+            outputs = self.cache.get_encode(content_hash, target_size_kb)
+            if not outputs:
+                # Never cached, or evicted since the image was checked
+                span['outcome'] = 'miss'
+                return False
+            span['bytes_out'] = sum(len(content) for content in outputs.values())
+            self.writer(outputs, base_path, label + ', cached')
+            return True
+    
+    def submit(self, img_content, target_size_kb, base_path, label, content_hash=None):
+        """
+        Encode img_content and write its derivatives next to base_path, label is used in the log line.
+        With a content_hash, cached derivatives are reused and new ones are cached.
+        """
+        bytes_in = len(img_content)
+        if self.submit_cached(content_hash, target_size_kb, base_path, label):
+            return
+        if self.executor is None:
+            with self.tracer.span('encode', bytes_in=bytes_in) as span:
+                outputs = self._encode_inline(img_content, target_size_kb)
+                span['bytes_out'] = sum(len(content) for content in outputs.values())
+            self._store(content_hash, target_size_kb, outputs)
+            self.writer(outputs, base_path, label)
+            return
+        if self._slots is not None:
+            self._slots.acquire()
+        with self._lock:
+            self.pending += 1
+        page, submitted = self.tracer.page, time.perf_counter()
+        future = self.executor.submit(_timed_encode, img_content, target_size_kb)
+        future.add_done_callback(lambda done: self._finish(done, base_path, label, content_hash, target_size_kb,
+                                                           page, submitted, bytes_in))
+    
+    def _store(self, content_hash, target_size_kb, outputs):
+        if self.cache is None or not content_hash or not outputs:
+            return
+        try:
+            self.cache.put_encode(content_hash, target_size_kb, outputs)
+        except Exception as e:
+            print(f"  Warning: could not cache encoded image: {str(e)}")
+    
+    def _encode_inline(self, img_content, target_size_kb):
+        try:
+            return encode_image_derivatives(img_content, target_size_kb)
+        except Exception as e:
+            print(f"  Error compressing image: {str(e)}")
+            return {}
+    
+    def _finish(self, future, base_path, label, content_hash, target_size_kb, page, submitted, bytes_in):
+        with self._lock:
+            self.pending -= 1
+        if self._slots is not None:
+            self._slots.release()
+        try:
+            outputs, seconds = future.result()
+        except Exception as e:
+            print(f"  Error compressing image: {str(e)}")
+            self.tracer.emit('encode', time.perf_counter() - submitted, page, bytes_in=bytes_in, error=type(e).__name__)
+            return
+        self.tracer.emit('encode', seconds, page, bytes_in=bytes_in,
+                         bytes_out=sum(len(content) for content in outputs.values()),
+                         queued=round(time.perf_counter() - submitted - seconds, 6))
+        self._store(content_hash, target_size_kb, outputs)
+        self.writer(outputs, base_path, label)
+    
+    def _write(self, outputs, base_path, label):
+        for suffix, content in outputs.items():
+            with open(base_path + suffix, 'wb') as f:
+                f.write(content)
+        # Derivatives of an earlier encode of this name that this one did not produce
+        for suffix in DERIVATIVE_SUFFIXES:
+            if suffix not in outputs and os.path.exists(base_path + suffix):
+                os.remove(base_path + suffix)
+        if '.jpg' in outputs:
+            sizes = ', '.join(f"{suffix.lstrip('_.')} {len(content) / 1024:.1f}KB" for suffix, content in outputs.items())
+            print(f"  Saved: {os.path.basename(base_path)} ({label}; {sizes})")
+    
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+# User agent sent with image requests
+IMAGE_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+BROWSER_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# Bytes of an image body read before giving up on parsing the header early
+HEADER_PROBE_LIMIT = 256 * 1024
+
+# Downloads kept in flight beyond the images a page still needs, to cover rejections
+DOWNLOAD_SLACK = 2
+
+class ImageRejected(Exception):
+    """Raised when an image fails a filter before it is fully downloaded"""
+    
+    def __init__(self, message, reason='rejected'):
+        super().__init__(message)
+        self.reason = reason
+
+class NotModified(Exception):
+    """Raised when a conditional request confirms the cached copy of an image"""
+    
+    def __init__(self, entry):
+        super().__init__('not modified')
+        self.entry = entry
+
+def probe_image_size(data):
+    """Return (width, height) if PIL can parse the header in data, else None"""
     try:
-        img = Image.open(BytesIO(img_content))
+        return Image.open(BytesIO(data)).size
+    except Exception:
+        return None
+
+def check_probed_size(width, height, allow_square):
+    """Raise ImageRejected if the probed size fails the dimension or aspect-ratio filter"""
+    # Verify it meets minimum size requirements
+    if not ((width >= 400 and height >= 600) or (width >= 600 and height >= 400)):
+        raise ImageRejected(f"actual size {width}x{height} too small", 'too_small')
+    # A square image may still be kept when it is the only option, so only the
+    # caller can reject the last candidate
+    if not allow_square and is_image_too_square(width, height):
+        aspect_ratio = max(width, height) / min(width, height)
+        raise ImageRejected(f"image too square (aspect ratio {aspect_ratio:.2f})", 'too_square')
+
+class ImageFetcher:
+    """
+    Pooled HTTP client for image downloads.
+    A single keep-alive session is shared by a thread pool, so requests to
+    the same CDN reuse connections. At most max_connections requests run at
+    once, and at most host_connections of them go to the same host.
+    """
+    
+    def __init__(self, max_connections=16, host_connections=4, cache=None, tracer=None):
+        self.cache = cache
+        self.tracer = tracer or Tracer()
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = IMAGE_USER_AGENT
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=host_connections)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.max_connections = max_connections
+        self.host_connections = host_connections
+        self.executor = ThreadPoolExecutor(max_workers=max_connections)
+        self._host_limits = {}
+        self._lock = threading.Lock()
+    
+    def _host_limit(self, url):
+        """Semaphore limiting the concurrent requests to the host of url"""
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.Semaphore(self.host_connections)
+            return self._host_limits[host]
+    
+    def request(self, method, url, **kwargs):
+        """Send one request through the shared session, respecting the host limit"""
+        with self._host_limit(url):
+            return self.session.request(method, url, **kwargs)
+    
+    def fetch(self, url):
+        """Plain GET of url, returning the whole body"""
+        response = self.request('GET', url, timeout=10)
+        response.raise_for_status()
+        return response.content
+    
+    def _download(self, url, stop_event, allow_square):
+        """
+        GET url and return its body, unless the page no longer needs it.
+        The body is streamed: once the first chunks are enough for PIL to read
+        the header, the size and aspect ratio are checked and a failing image
+        is rejected without downloading the rest. A passing image continues on
+        the same stream.
+        With a cache, the request is conditional and a 304 raises NotModified.
+        """
+        if stop_event.is_set():
+            return None
+        headers = self.cache.conditional_headers(url) if self.cache is not None else {}
+        with self._host_limit(url):
+            # The page may have been completed while this waited for a connection
+            if stop_event.is_set():
+                return None
+            response = self.session.get(url, timeout=10, stream=True, headers=headers)
+            try:
+                if response.status_code == 304 and headers:
+                    entry = self.cache.lookup(url)
+                    if entry:
+                        raise NotModified(entry)
+                    # Evicted in the meantime, fetch it again without validators
+                    response.close()
+                    response = self.session.get(url, timeout=10, stream=True)
+                response.raise_for_status()
+                
+                # Reject on the announced size before reading any of the body
+                content_length = response.headers.get('content-length')
+                if content_length and content_length.isdigit() and int(content_length) < 120 * 1024:
+                    raise ImageRejected(f"image too small ({int(content_length) / 1024:.1f}KB)", 'small_file')
+                
+                # Read just enough to parse the header
+                chunks = response.iter_content(chunk_size=16 * 1024)
+                body = bytearray()
+                size = None
+                for chunk in chunks:
+                    body += chunk
+                    size = probe_image_size(body)
+                    if size or len(body) >= HEADER_PROBE_LIMIT:
+                        break
+                if size:
+                    check_probed_size(size[0], size[1], allow_square)
+                
+                # Passed the probe, read the rest of the same response
+                for chunk in chunks:
+                    if stop_event.is_set():
+                        return None
+                    body += chunk
+                body = bytes(body)
+                if self.cache is not None:
+                    self.cache.store_validators(url, response.headers.get('ETag'),
+                                                response.headers.get('Last-Modified'), get_image_hash(body))
+                return body
+            finally:
+                response.close()
+    
+    def _traced_download(self, url, stop_event, allow_square, page):
+        """_download as a 'download' span of page, with the bytes read and the outcome"""
+        with self.tracer.span('download', page) as span:
+            try:
+                body = self._download(url, stop_event, allow_square)
+            except NotModified:
+                span['outcome'] = 'not_modified'
+                raise
+            except ImageRejected as e:
+                span['outcome'] = e.reason
+                raise
+            span['outcome'] = 'ok' if body is not None else 'cancelled'
+            span['bytes_in'] = len(body) if body else 0
+            return body
+    
+    def iter_downloads(self, candidates, needed=None):
+        """
+        Download candidates concurrently and yield (candidate, content, error)
+        in candidate order, so results can be filtered as they arrive.
+        error is an ImageRejected when the header probe already failed it, or
+        a NotModified carrying the cached entry when the image is unchanged.
+        Candidates that already carry their 'content' are not downloaded.
+        needed() returns how many more images the consumer can use (after the
+        downloads it has not checked yet), or None once it is done; only that
+        many plus DOWNLOAD_SLACK downloads (at most max_connections) are kept
+        in flight. Closing the generator cancels everything that has not
+        started yet.
+        """
+        stop_event = threading.Event()
+        pending = deque()
+        remaining = iter(enumerate(candidates))
+        exhausted = False
+        try:
+            while True:
+                window = self.max_connections
+                if needed is not None:
+                    wanted = needed()
+                    if wanted is None:
+                        return
+                    window = min(window, wanted + DOWNLOAD_SLACK)
+                while len(pending) < window and not exhausted:
+                    position, candidate = next(remaining, (None, None))
+                    if candidate is None:
+                        exhausted = True
+                        break
+                    if candidate.get('content') is not None:
+                        future = Future()
+                        future.set_result(candidate['content'])
+                    else:
+                        # Only the last candidate may be kept despite being too square
+                        allow_square = position == len(candidates) - 1
+                        future = self.executor.submit(self._traced_download, candidate['src'], stop_event,
+                                                      allow_square, self.tracer.page)
+                    pending.append((candidate, future))
+                if not pending:
+                    if exhausted:
+                        return
+                    # The consumer is still checking earlier downloads; wait until it needs more
+                    time.sleep(0.02)
+                    continue
+                candidate, future = pending.popleft()
+                try:
+                    yield candidate, future.result(), None
+                except Exception as e:
+                    yield candidate, None, e
+        finally:
+            stop_event.set()
+            for _, future in pending:
+                future.cancel()
+    
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+def create_image_fetcher(settings, cache=None, tracer=None):
+    """Create the ImageFetcher configured by the run settings"""
+    return ImageFetcher(settings['max_connections'], settings['host_connections'], cache, tracer)
+
+def open_image_cache(settings):
+    """Open the image cache configured by the run settings, None when disabled"""
+    if not settings['cache_dir']:
+        return None
+    return ImageCache(settings['cache_dir'], int(settings['cache_max_mb'] * 1024 * 1024))
+
+def open_snapshot_store(settings):
+    """Open the page snapshot store configured by the run settings, None when disabled"""
+    if not settings['snapshot_dir']:
+        return None
+    return SnapshotStore(settings['snapshot_dir'])
+
+def open_dedupe_index(settings):
+    """Open the near-duplicate index configured by the run settings, None when disabled"""
+    if settings['dedupe_distance'] is None:
+        return None
+    return NearDuplicateIndex(settings['ledger_path'], settings['dedupe_distance'])
+
+# Defaults for the per-run scraper settings; CLI flags override these
+DEFAULT_SETTINGS = {
+    'readiness': 'adaptive',    # page readiness strategy (see READINESS_STRATEGIES)
+    'ready_timeout': 15.0,      # upper bound in seconds for the adaptive wait
+    'stable_window': 0.75,      # seconds the DOM must stay unchanged
+    'scroll': False,            # scroll through the page to trigger lazy loading
+    'max_connections': 16,      # concurrent image requests per process
+    'host_connections': 4,      # concurrent image requests per host
+    'encode_workers': 2,        # compression processes per browser worker (0 = inline)
+    'cache_dir': '.image_cache',  # image cache shared across runs ('' disables it)
+    'cache_max_mb': 500,        # size limit of the cached encodes
+    'ledger_path': 'scraper_state.db',  # SQLite job ledger used for resuming
+    'dedupe_distance': 6,       # max differing dHash bits of a near-duplicate (None disables)
+    'trace_path': 'run_trace.jsonl',  # JSONL span trace of the current run, the previous one is kept as .1 ('' disables it)
+    'prometheus_path': '',      # Prometheus textfile written after the run ('' skips it)
+    'profile_index': None,      # profile only the URL at this index
+    'profiler': 'cprofile',     # cprofile or pyinstrument
+    'host_rate': 1.0,           # max page loads per second per host
+    'host_concurrency': 2,      # max parallel page loads per host
+    'max_attempts': 3,          # attempts per URL for 429/5xx and transient errors
+    'retry_backoff': 5.0,       # seconds before the first retry, doubled per attempt
+    'render_workers': 1,        # pipeline threads with their own Chrome (static fetches included)
+    'fetch_workers': 2,         # pipeline threads probing and downloading the images of a page
+    'filter_workers': 1,        # pipeline threads running the image filters
+    'queue_size': 2,            # pages waiting between two pipeline stages
+    'static_min_images': 4,     # images the static HTML must yield to skip Chrome (0 always uses Chrome)
+    'network_capture': False,   # take image bytes from Chrome's network layer via CDP
+    'block_resources': True,    # with network_capture, block fonts, video, maps and trackers
+    'blocklist_path': 'blocklist.txt',  # extra URL patterns to block, one per line
+    'snapshot_dir': '',         # store page snapshots here for --reprocess ('' disables it)
+}
+
+# Page snapshot polled by the adaptive wait; "large" images use the same 400x600 rule as the filter.
+# A native loading="lazy" image far below the viewport only loads when scrolled to, so it
+# does not count as pending; the harvest still finds it through its src/srcset.
+_PAGE_STATE_SCRIPT = """
+const big = Array.from(document.images).filter(img => {
+    const w = img.clientWidth, h = img.clientHeight;
+    return (w >= 400 && h >= 600) || (w >= 600 && h >= 400);
+});
+const nearViewport = img => img.getBoundingClientRect().top < window.innerHeight * 2;
+return {
+    ready: document.readyState,
+    elements: document.getElementsByTagName('*').length,
+    images: document.images.length,
+    big: big.length,
+    pending: big.filter(img => !img.complete && (img.loading !== 'lazy' || nearViewport(img))).length,
+    height: document.documentElement.scrollHeight
+};
+"""
+
+def wait_fixed_delay(driver, settings):
+    """Legacy readiness strategy: always sleep 5 seconds"""
+    time.sleep(5)
+    return 'fixed'
+
+def scroll_through_page(driver, max_steps=20, pause=0.15):
+    """Scroll down one viewport at a time so lazy-loaded galleries start loading"""
+    viewport = driver.execute_script("return window.innerHeight") or 1080
+    position = 0
+    for _ in range(max_steps):
+        height = driver.execute_script("return document.documentElement.scrollHeight")
+        if position >= height:
+            break
+        position += viewport
+        driver.execute_script("window.scrollTo(0, arguments[0]);", position)
+        time.sleep(pause)
+    driver.execute_script("window.scrollTo(0, 0);")
+
+def wait_until_page_settled(driver, settings):
+    """
+    Adaptive readiness strategy.
+    Waits for document.readyState, then until every large <img> has loaded
+    (except native lazy images below the fold) and the DOM has not changed
+    for settings['stable_window'] seconds.
+    Gives up after settings['ready_timeout'] seconds.
+    """
+    deadline = time.monotonic() + settings['ready_timeout']
+    
+    # Wait for the document itself
+    while driver.execute_script("return document.readyState") != 'complete':
+        if time.monotonic() >= deadline:
+            return 'timeout'
+        time.sleep(0.1)
+    
+    if settings['scroll']:
+        scroll_through_page(driver)
+    
+    # Wait for large images to finish and the DOM to stop changing
+    last_state = None
+    stable_since = time.monotonic()
+    while True:
+        state = driver.execute_script(_PAGE_STATE_SCRIPT)
+        now = time.monotonic()
+        fingerprint = (state['elements'], state['images'], state['big'], state['height'])
+        if fingerprint != last_state:
+            last_state = fingerprint
+            stable_since = now
+        if state['pending'] == 0 and now - stable_since >= settings['stable_window']:
+            return 'stable'
+        if now >= deadline:
+            return 'timeout'
+        time.sleep(0.1)
+
+# Pluggable page readiness strategies: name -> function(driver, settings) returning a reason
+READINESS_STRATEGIES = {
+    'fixed': wait_fixed_delay,
+    'adaptive': wait_until_page_settled,
+}
+
+def wait_for_page(driver, settings):
+    """Run the configured readiness strategy and return (seconds waited, reason)"""
+    started = time.monotonic()
+    try:
+        reason = READINESS_STRATEGIES[settings['readiness']](driver, settings)
+    except Exception as e:
+        # A failing strategy should never cost the page, just report it
+        print(f"  Warning: readiness check failed: {str(e)}")
+        reason = 'error'
+    return time.monotonic() - started, reason
+
+def create_chrome_driver(settings=DEFAULT_SETTINGS):
+    """
+    Start a headless Chrome instance configured for scraping.
+    With settings['network_capture'] the performance log and the CDP Network
+    domain are enabled for NetworkCapture, and the blocklist is applied.
+    """
+    chrome_options = Options()
+    chrome_options.add_argument('--headless=new')
+    chrome_options.add_argument('--disable-gpu')
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument('--window-size=1920,1080')
+    chrome_options.add_argument('--disable-blink-features=AutomationControlled')
+    chrome_options.add_argument(f'--user-agent={BROWSER_USER_AGENT}')
+    chrome_options.add_argument('--disable-software-rasterizer')
+    chrome_options.add_argument('--log-level=3')
+    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation", "enable-logging"])
+    chrome_options.add_experimental_option('useAutomationExtension', False)
+    if settings['network_capture']:
+        chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    
+    driver = webdriver.Chrome(options=chrome_options)
+    driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+    if settings['network_capture']:
+        enable_network_capture(driver, load_blocklist(settings['blocklist_path']) if settings['block_resources'] else [])
+    return driver
+
+class LazyDriver:
+    """
+    Chrome driver that is only started when a page first needs the browser.
+    capture is its NetworkCapture in network_capture mode, otherwise None.
+    """
+    
+    def __init__(self, settings=DEFAULT_SETTINGS):
+        self.settings = settings
+        self.capture = None
+        self._driver = None
+    
+    def get(self):
+        if self._driver is None:
+            self._driver = create_chrome_driver(self.settings)
+            if self.settings['network_capture']:
+                self.capture = NetworkCapture(self._driver)
+        return self._driver
+    
+    def quit(self):
+        if self._driver is not None:
+            self._driver.quit()
+            self._driver = None
+            self.capture = None
+
+def extract_title(page_title):
+    """
+    Pick the address part of a page title.
+    A valid part must have a digit, a comma and >5 letters before and after the comma.
+    If no part is valid, the whole title is returned with a <bad> flag.
+    """
+    # Split on both - and | to get all parts
+    parts = re.split(r'[-|]', page_title)
+    
+    # Clean and strip all parts
+    parts = [p.strip() for p in parts]
+    
+    for part in parts:
+        if not part:
+            continue
         
-        # Convert RGBA to RGB if needed
-        if img.mode == 'RGBA':
-            background = Image.new('RGB', img.size, (255, 255, 255))
-            background.paste(img, mask=img.split()[3])
-            img = background
-        elif img.mode != 'RGB':
-            img = img.convert('RGB')
+        # Check if part contains a digit
+        if not any(char.isdigit() for char in part):
+            continue
         
-        # Start with high quality
-        quality = 95
-        output = BytesIO()
+        # Check if part contains a comma
+        if ',' not in part:
+            continue
         
-        # Iteratively reduce quality until we hit target size
-        while quality > 20:
-            output = BytesIO()
-            img.save(output, format='JPEG', quality=quality, optimize=True)
-            size_kb = len(output.getvalue()) / 1024
-            
-            if size_kb <= target_size_kb:
-                break
-            
-            # Reduce quality more aggressively if we're far from target
-            if size_kb > target_size_kb * 2:
-                quality -= 15
-            elif size_kb > target_size_kb * 1.5:
-                quality -= 10
-            else:
-                quality -= 5
+        # Split by comma
+        comma_parts = part.split(',')
+        if len(comma_parts) < 2:
+            continue
         
-        # If still too large, resize the image
-        if len(output.getvalue()) / 1024 > target_size_kb:
-            scale_factor = 0.9
-            while len(output.getvalue()) / 1024 > target_size_kb and scale_factor > 0.3:
-                new_width = int(img.width * scale_factor)
-                new_height = int(img.height * scale_factor)
-                resized_img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                
-                output = BytesIO()
-                resized_img.save(output, format='JPEG', quality=85, optimize=True)
-                scale_factor -= 0.1
+        before_comma = comma_parts[0].strip()
+        after_comma = comma_parts[1].strip()
+        
+        # Count alphabet characters before comma
+        alpha_before = sum(1 for c in before_comma if c.isalpha())
+        # Count alphabet characters after comma
+        alpha_after = sum(1 for c in after_comma if c.isalpha())
         
-        return output.getvalue()
+        # Must have >5 alphabet chars before and after comma
+        if alpha_before > 5 and alpha_after > 5:
+            return part.strip()
+    
+    # If no valid title found, use whole title with <bad> flag
+    # Remove double spacing from the whole title
+    cleaned_title = re.sub(r'\s+', ' ', page_title).strip()
+    return f"<bad>{cleaned_title}"
+
+# HTTP status of the main document (Chrome 109+), 0 when the browser does not report it
+_NAVIGATION_STATUS_SCRIPT = "const nav = performance.getEntriesByType('navigation')[0]; return nav ? nav.responseStatus || 0 : 0;"
+
+# <meta charset> or <meta http-equiv="Content-Type" content="...; charset=..."> near the top of a page
+_META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([a-zA-Z0-9_.:-]+)', re.I)
+
+def response_html(response):
+    """
+    Text of an HTML response. requests decodes text/html without a charset
+    parameter as ISO-8859-1, which garbles æ/ø/å in UTF-8 pages, so then the
+    page's <meta charset> is used, or the encoding detected from the bytes.
+    """
+    if 'charset=' in response.headers.get('Content-Type', '').lower():
+        return response.text
+    match = _META_CHARSET.search(response.content[:4096])
+    encoding = match.group(1).decode('ascii') if match else None
+    try:
+        codecs.lookup(encoding or '')
+    except LookupError:
+        encoding = response.apparent_encoding
+    return response.content.decode(encoding or 'utf-8', errors='replace')
+
+def fetch_static_page(fetcher, url):
+    """GET the raw HTML of url with a browser user agent; returns (status, html)"""
+    response = fetcher.request('GET', url, timeout=15, headers={
+        'User-Agent': BROWSER_USER_AGENT,
+        'Accept': 'text/html,application/xhtml+xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'da,en;q=0.8'})
+    if 'html' not in response.headers.get('Content-Type', 'text/html'):
+        return response.status_code, ''
+    return response.status_code, response_html(response)
+
+def load_static_page(fetcher, url, settings, result, snapshot=None):
+    """
+    Fast path: fetch and parse the page's raw HTML, without Chrome.
+    Returns (escalation, title, candidates). escalation is the reason the
+    page needs the browser, or None when there is a valid title and at least
+    settings['static_min_images'] image candidates. On a 429/5xx response the
+    error is recorded in result and no candidates are returned.
+    The HTML is kept in snapshot, if given.
+    """
+    tracer = fetcher.tracer
+    with tracer.span('static_fetch') as span:
+        status, html = fetch_static_page(fetcher, url)
+        span['status'] = status
+        span['bytes_in'] = len(html)
+    if status in THROTTLE_STATUSES:
+        # The browser would hit the same limit; let the scheduler retry later
+        print(f"Page returned HTTP {status}")
+        result['status'] = status
+        result['error'] = f'HTTP {status}'
+        result['error_class'] = 'HTTPStatus'
+        return None, None, None
+    if status != 200 or not html:
+        return (f'http_{status}' if status != 200 else 'not_html'), None, None
+    result['status'] = status
+    if snapshot is not None:
+        snapshot.update(tier='static', html=html)
+    
+    with tracer.span('static_parse', bytes_in=len(html)) as span:
+        page = parse_static_page(html, url)
+        span['candidates'] = len(page['images'])
+    titles = [extract_title(title) for title in page['titles']]
+    title = next((title for title in titles if not title.startswith('<bad>')), None)
+    if title is None:
+        return 'bad_title', None, None
+    if len(page['images']) < settings['static_min_images']:
+        return 'few_candidates', None, None
+    print(f"Static HTML: {len(page['images'])} image candidates")
+    return None, title, page['images']
+
+def finish_static_page(fetcher, encoder, result, title, temp_images, settings, dedupe=None):
+    """
+    Complete a page from the static tier if enough images were accepted.
+    Returns None when done, otherwise 'few_images' and the accepted images
+    are discarded for the browser to try again.
+    """
+    if len(temp_images) < settings['static_min_images']:
+        return 'few_images'
+    print(f"Title: {title}")
+    result['tier'] = 'static'
+    result['title'] = title
+    result['images'] = queue_page_images(fetcher, encoder, temp_images, result['index'], dedupe)
+    result['image_count'] = len(result['images'])
+    return None
+
+def escalate_to_browser(result, escalation):
+    """Record why the static tier gave up on a page"""
+    print(f"Static HTML not enough ({escalation}), loading in Chrome")
+    result['escalation'] = escalation
+    result.pop('status', None)
+
+def load_browser_page(browser, fetcher, url, settings, result, snapshot=None):
+    """
+    Load url in Chrome (browser is a LazyDriver, started on first use), wait
+    until it is ready and read its title. Returns the image candidates, or
+    None when the page failed and result already holds the error.
+    The rendered DOM, raw title and harvested images are kept in snapshot, if given.
+    """
+    tracer = fetcher.tracer
+    result['tier'] = 'browser'
+    driver = browser.get()
+    if browser.capture is not None:
+        browser.capture.reset()
+    
+    # Navigate to the URL and wait until it is ready
+    load_started = time.monotonic()
+    with tracer.span('page_load') as span:
+        driver.get(url)
+        status = driver.execute_script(_NAVIGATION_STATUS_SCRIPT)
+        if status:
+            span['status'] = result['status'] = status
+    if status and status >= 400:
+        # Error pages have no listing; 429/5xx are retried by the scheduler
+        print(f"Page returned HTTP {status}")
+        result['error'] = f'HTTP {status}'
+        result['error_class'] = 'HTTPStatus'
+        return None
+    with tracer.span('readiness') as span:
+        wait_seconds, wait_reason = wait_for_page(driver, settings)
+        span['reason'] = wait_reason
+    result['wait_seconds'] = wait_seconds
+    result['load_seconds'] = time.monotonic() - load_started
+    print(f"Page ready after {wait_seconds:.2f}s ({wait_reason})")
+    
+    # Extract page title
+    try:
+        with tracer.span('title'):
+            page_title = extract_title(driver.title)
+        if page_title.startswith('<bad>'):
+            print(f"Title: {page_title[len('<bad>'):]} (marked as bad)")
+        else:
+            print(f"Title: {page_title}")
+        result['title'] = page_title
+    except Exception as e:
+        print(f"Could not extract title: {str(e)}")
+    
+    # Keep the title even if the image stage fails
+    try:
+        if snapshot is not None:
+            try:
+                snapshot.update(tier='browser', title=driver.title, html=driver.page_source)
+            except Exception as e:
+                print(f"  Warning: could not snapshot the page: {str(e)}")
+        return harvest_page_candidates(driver, fetcher, url, browser.capture, snapshot)
+    except Exception as e:
+        record_image_error(result, e)
+        return None
+
+def save_snapshot(snapshots, tracer, snapshot, result, temp_images):
+    """Store the snapshot of a finished page with the URLs of its accepted images"""
+    if snapshots is None or not snapshot.get('tier'):
+        return
+    try:
+        with tracer.span('snapshot') as span:
+            span['bytes_out'] = snapshots.save(dict(snapshot, url=result['url'], index=result['index'],
+                                                    selected=[image['src'] for image in temp_images]))
     except Exception as e:
-        print(f"  Error compressing image: {str(e)}")
-        return img_content
+        print(f"  Warning: could not save snapshot: {str(e)}")
+
+def record_image_error(result, error):
+    """Record a failed image stage in result, keeping the title"""
+    print(f"Error processing {result['url']}: {str(error)}")
+    result['error'] = str(error)
+    result['error_class'] = type(error).__name__
 
-def get_webpage_screenshot():
+def process_url(browser, fetcher, encoder, url, index, settings=DEFAULT_SETTINGS, dedupe=None, snapshots=None):
     """
-    Reads URLs from final_urls.json and downloads the 4 biggest unique images from each webpage.
-    Only downloads images that are at least 400x600 pixels and 120KB in size.
-    Images are saved in the screenshots folder with format {index}_{1-4}.png
-    Resumes from the last processed index if images already exist.
+    Process one URL: extract its title and save its 4 biggest unique images.
+    The raw HTML is tried first; only pages it cannot serve are loaded in
+    Chrome, which browser (a LazyDriver) starts on first use.
+    Returns a result dict with the index, the extracted title (None if it
+    could not be read), the tier that served the page, the seconds spent
+    waiting for the page, the page load latency and HTTP status, and the
+    number of saved images. With a SnapshotStore, the page is snapshotted
+    for --reprocess.
     """
-    # Check if urls.txt exists and merge new URLs
-    if os.path.exists('urls.txt'):
-        print("Checking urls.txt for new URLs...")
-        with open('urls.txt', 'r', encoding='utf-8') as f:
-            raw_urls = [line.strip() for line in f if line.strip()]
+    result = {'index': index, 'url': url, 'title': None, 'image_count': 0}
+    snapshot = {} if snapshots is not None else None
+    
+    if settings['static_min_images'] > 0:
+        try:
+            escalation, title, candidates = load_static_page(fetcher, url, settings, result, snapshot)
+            if escalation is None and candidates is not None:
+                temp_images = collect_page_images(fetcher, candidates, index, dedupe)
+                escalation = finish_static_page(fetcher, encoder, result, title, temp_images, settings, dedupe)
+                if escalation is None:
+                    save_snapshot(snapshots, fetcher.tracer, snapshot, result, temp_images)
+        except Exception as e:
+            escalation = f'error_{type(e).__name__}'
+        if escalation is None:
+            result['tier'] = 'static'
+            return result
+        escalate_to_browser(result, escalation)
+    
+    snapshot = {} if snapshots is not None else None
+    candidates = load_browser_page(browser, fetcher, url, settings, result, snapshot)
+    if candidates is None:
+        return result
+    try:
+        temp_images = collect_page_images(fetcher, candidates, index, dedupe)
+        result['images'] = queue_page_images(fetcher, encoder, temp_images, index, dedupe)
+        result['image_count'] = len(result['images'])
+        save_snapshot(snapshots, fetcher.tracer, snapshot, result, temp_images)
+    except Exception as e:
+        record_image_error(result, e)
+    return result
+
+def run_task(browser, fetcher, encoder, index, url, total, settings, dedupe=None, snapshots=None):
+    """Process one URL and always return a result, timed and with the error class on failure"""
+    started = time.monotonic()
+    fetcher.tracer.begin_page(index, url)
+    try:
+        print(f"\nProcessing {index}/{total - 1}: {url}")
+        result = process_url(browser, fetcher, encoder, url, index, settings, dedupe, snapshots)
+    except Exception as e:
+        print(f"Error processing {url}: {str(e)}")
+        result = {'index': index, 'url': url, 'title': None, 'image_count': 0,
+                  'error': str(e), 'error_class': type(e).__name__}
+    result['duration'] = time.monotonic() - started
+    fetcher.tracer.end_page(result)
+    return result
+
+# Collects all image candidates of the rendered page in one execute_script call:
+# <img> elements (src, currentSrc, parsed srcset, natural and rendered size),
+# <source> elements of their <picture> and CSS background images
+_HARVEST_IMAGES_SCRIPT = """
+const absolute = u => { try { return new URL(u, document.baseURI).href; } catch (e) { return null; } };
+const parseSrcset = srcset => (srcset || '').split(/,\\s+/).map(part => {
+    const [u, descriptor] = part.trim().split(/\\s+/);
+    const item = {url: absolute(u), w: 0, x: 0};
+    if (descriptor && descriptor.endsWith('w')) item.w = parseFloat(descriptor) || 0;
+    else if (descriptor && descriptor.endsWith('x')) item.x = parseFloat(descriptor) || 0;
+    else item.x = 1;
+    return item;
+}).filter(item => item.url);
+
+const results = [];
+for (const img of document.images) {
+    const rect = img.getBoundingClientRect();
+    let srcset = parseSrcset(img.getAttribute('srcset'));
+    const picture = img.parentElement && img.parentElement.tagName === 'PICTURE' ? img.parentElement : null;
+    if (picture) {
+        for (const source of picture.querySelectorAll('source')) {
+            srcset = srcset.concat(parseSrcset(source.getAttribute('srcset')));
+        }
+    }
+    results.push({
+        kind: picture ? 'picture' : 'img',
+        src: img.src ? absolute(img.src) : null,
+        current_src: img.currentSrc ? absolute(img.currentSrc) : null,
+        srcset: srcset,
+        natural_width: img.naturalWidth,
+        natural_height: img.naturalHeight,
+        width: Math.round(rect.width),
+        height: Math.round(rect.height)
+    });
+}
+
+for (const el of document.body ? document.body.getElementsByTagName('*') : []) {
+    // Check the cheap rendered size first, computed styles are expensive
+    if (el.offsetWidth < 400 || el.offsetHeight < 400) continue;
+    const background = getComputedStyle(el).backgroundImage;
+    if (!background || background === 'none') continue;
+    for (const match of background.matchAll(/url\\(["']?(.*?)["']?\\)/g)) {
+        results.push({
+            kind: 'background',
+            src: absolute(match[1]),
+            current_src: null,
+            srcset: [],
+            natural_width: 0,
+            natural_height: 0,
+            width: el.offsetWidth,
+            height: el.offsetHeight
+        });
+    }
+}
+return results;
+"""
+
+def harvest_page_images(driver):
+    """Return the image payload of the loaded page (see _HARVEST_IMAGES_SCRIPT)"""
+    return driver.execute_script(_HARVEST_IMAGES_SCRIPT) or []
+
+def pick_image_url(item):
+    """Pick the largest variant of a harvested image: srcset first, then currentSrc, then src"""
+    if item.get('srcset'):
+        best = max(item['srcset'], key=lambda variant: (variant.get('w') or 0, variant.get('x') or 0))
+        if best.get('url'):
+            return best['url']
+    return item.get('current_src') or item.get('src')
+
+def select_candidate_images(harvested, page_url):
+    """
+    Turn the harvested payload into download candidates.
+    Keeps images rendered at least 400x600 (or 600x400), drops data: URLs
+    and repeats, and sorts by rendered area (biggest first).
+    """
+    candidates = []
+    seen_urls = set()
+    for item in harvested:
+        width = item.get('width') or 0
+        height = item.get('height') or 0
         
-        # Clean URLs from txt file
-        cleaned_new_urls = []
-        seen_new = set()
-        for url in raw_urls:
-            cleaned = clean_url(url)
-            if cleaned and cleaned not in seen_new:
-                cleaned_new_urls.append(cleaned)
-                seen_new.add(cleaned)
+        # Check if image meets minimum size (400x600 or 600x400)
+        if not ((width >= 400 and height >= 600) or (width >= 600 and height >= 400)):
+            continue
+        
+        src = pick_image_url(item)
+        if not src or src.startswith('data:'):
+            continue
+        src = urljoin(page_url, src)
+        if src in seen_urls:
+            continue
+        seen_urls.add(src)
+        
+        candidates.append({
+            'src': src,
+            'kind': item.get('kind', 'img'),
+            'width': width,
+            'height': height,
+            'area': width * height,
+            'natural_width': item.get('natural_width') or 0,
+            'natural_height': item.get('natural_height') or 0
+        })
+    
+    # Sort by area (biggest first)
+    candidates.sort(key=lambda x: x['area'], reverse=True)
+    return candidates
+
+def harvest_page_candidates(driver, fetcher, url, capture=None, snapshot=None):
+    """
+    Image candidates of the page loaded in driver, biggest first.
+    With a NetworkCapture, candidates Chrome already loaded carry their bytes
+    in 'content', taken from its network layer instead of a second download.
+    The harvested payload is kept in snapshot, if given.
+    """
+    tracer = fetcher.tracer
+    
+    # Collect every image on the page in a single WebDriver round-trip
+    with tracer.span('harvest') as span:
+        harvested = harvest_page_images(driver)
+        candidates = select_candidate_images(harvested, url)
+        span['candidates'] = len(candidates)
+    print(f"Found {len(candidates)} candidate images (>= 400x600)")
+    if snapshot is not None:
+        snapshot['harvested'] = harvested
+    
+    if capture is not None:
+        with tracer.span('network_capture') as span:
+            span['images'] = capture.collect()
+            span['blocked'] = capture.blocked
+            captured = 0
+            for candidate in candidates:
+                body = capture.body(candidate['src'])
+                if body is not None:
+                    candidate['content'] = body
+                    candidate['validators'] = capture.validators(candidate['src'])
+                    captured += len(body)
+            span['bytes_in'] = captured
+        reused = sum(1 for candidate in candidates if 'content' in candidate)
+        print(f"Captured {reused} of {len(candidates)} images from Chrome ({captured / 1024:.0f}KB), "
+              f"{capture.blocked} requests blocked")
+    return candidates
+
+class PageFilter:
+    """
+    The image filters of one page, fed one download at a time in candidate
+    order: file size, exact and near duplicates, mostly-white, dimensions
+    and aspect ratio. Accepted images are kept in temp_images with their
+    bytes until the page is queued for encoding.
+    """
+    
+    def __init__(self, fetcher, candidates, index, dedupe=None):
+        self.fetcher = fetcher
+        self.tracer = fetcher.tracer
+        self.candidates = candidates
+        self.index = index
+        self.dedupe = dedupe
+        self.downloaded_hashes = set()
+        self.page_dhashes = []
+        if dedupe is not None:
+            # Pick up the images other workers saved since the last page
+            dedupe.refresh()
+        self.saved_count = 0
+        self.white_image_count = 0
+        self.temp_images = []  # Store images temporarily before compression
+    
+    def add(self, img_info, img_content, download_error):
+        """Check one download result; returns True once four images are accepted"""
+        tracer = self.tracer
+        try:
+            return self._check(tracer, img_info, img_content, download_error)
+        except Exception as e:
+            tracer.reject('download_error')
+            print(f"  Error downloading image: {str(e)}")
+            return False
+    
+    def _check(self, tracer, img_info, img_content, download_error):
+        if isinstance(download_error, ImageRejected):
+            tracer.reject(download_error.reason)
+            print(f"  Skipping: {download_error} (rejected from header)")
+            return False
+        if isinstance(download_error, NotModified):
+            # Unchanged since the last run, reuse the recorded checks
+            cached = download_error.entry
+            img_content = None
+            content_size, img_hash = cached['size'], cached['content_hash']
+            mostly_white = bool(cached['mostly_white'])
+            image_size = (cached['width'], cached['height'])
+            print(f"  Not modified since last run, reusing cached checks")
+        elif download_error is not None:
+            raise download_error
+        else:
+            content_size = len(img_content)
+            img_hash = get_image_hash(img_content)
+            with tracer.span('white_check', bytes_in=content_size):
+                mostly_white = is_image_mostly_white(img_content)
+            image_size = probe_image_size(img_content)
+            if self.fetcher.cache is not None and image_size:
+                if img_info.get('content') is not None:
+                    # Captured from Chrome, record the validators of its response
+                    etag, last_modified = img_info.get('validators', (None, None))
+                    self.fetcher.cache.store_validators(img_info['src'], etag, last_modified, img_hash)
+                self.fetcher.cache.store_verdicts(img_info['src'], content_size, image_size[0], image_size[1], mostly_white)
         
-        # Check if final_urls.json exists
-        if os.path.exists('final_urls.json'):
-            # Load existing entries
-            with open('final_urls.json', 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                existing_entries = data.get('urls', [])
+        # Check file size (must be at least 120KB)
+        if content_size < 120 * 1024:
+            tracer.reject('small_file')
+            print(f"  Skipping: downloaded file too small ({content_size / 1024:.1f}KB)")
+            return False
+        
+        # Check if image is duplicate
+        if img_hash in self.downloaded_hashes:
+            tracer.reject('duplicate')
+            print(f"  Skipping duplicate image")
+            return False
+        
+        # Check if image is a near-duplicate of one on this page or elsewhere in the corpus
+        dhash = None
+        dedupe = self.dedupe
+        if dedupe is not None:
+            if img_content is None:
+                dhash = dedupe.dhash_for(img_hash)
+            else:
+                with tracer.span('dhash', bytes_in=content_size):
+                    dhash = get_image_dhash(img_content)
+        if dhash is not None:
+            if any(hamming_distance(dhash, other) <= dedupe.max_distance for other in self.page_dhashes):
+                tracer.reject('near_duplicate')
+                print(f"  Skipping near-duplicate image")
+                return False
+            match = dedupe.find(dhash, exclude_index=self.index)
+            if match:
+                tracer.reject('near_duplicate')
+                print(f"  Skipping: near-duplicate of {match[0]} (distance {match[1]})")
+                return False
+        
+        # Only skip a mostly-white or square image if we have other images or will have other images
+        # If this is our only chance and we have no saved images yet, keep it
+        is_last = len(self.candidates) - self.candidates.index(img_info) <= 1
+        
+        # Check if image is mostly white
+        if mostly_white:
+            self.white_image_count += 1
+            if self.saved_count > 0 or not is_last:
+                tracer.reject('mostly_white')
+                print(f"  Skipping: image is mostly white (>50%)")
+                return False
+            else:
+                print(f"  Warning: Keeping mostly-white image (only option available)")
+        
+        # Verify actual image dimensions
+        try:
+            actual_width, actual_height = image_size
+            
+            # Verify it meets minimum size requirements
+            if not ((actual_width >= 400 and actual_height >= 600) or 
+                   (actual_width >= 600 and actual_height >= 400)):
+                tracer.reject('too_small')
+                print(f"  Skipping: actual size {actual_width}x{actual_height} too small")
+                return False
             
-            # Get existing URLs
-            existing_urls = set()
-            for entry in existing_entries:
-                if isinstance(entry, dict):
-                    existing_urls.add(entry['url'])
+            # Check if image is too square
+            if is_image_too_square(actual_width, actual_height):
+                if self.saved_count > 0 or not is_last:
+                    aspect_ratio = max(actual_width, actual_height) / min(actual_width, actual_height)
+                    tracer.reject('too_square')
+                    print(f"  Skipping: image too square (aspect ratio {aspect_ratio:.2f})")
+                    return False
                 else:
-                    existing_urls.add(entry)
+                    print(f"  Warning: Keeping square image (only option available)")
+        except:
+            tracer.reject('unverifiable')
+            print(f"  Skipping: cannot verify image")
+            return False
+        
+        # Store image temporarily (will compress after collecting all images)
+        self.saved_count += 1
+        self.temp_images.append({
+            'src': img_info['src'],
+            'content': img_content,
+            'hash': img_hash,
+            'dhash': dhash,
+            'width': actual_width,
+            'height': actual_height,
+            'original_size': content_size
+        })
+        
+        self.downloaded_hashes.add(img_hash)
+        if dhash is not None:
+            self.page_dhashes.append(dhash)
+        print(f"  Collected: image {self.saved_count} ({actual_width}x{actual_height}, {content_size / 1024:.1f}KB)")
+        
+        # Stop as soon as four images are accepted
+        return self.saved_count >= 4
+
+def collect_page_images(fetcher, candidates, index, dedupe=None):
+    """
+    Download and filter candidates until 4 unique images are accepted.
+    Returns the accepted images with their bytes, nothing is saved yet.
+    """
+    page_filter = PageFilter(fetcher, candidates, index, dedupe)
+    
+    # Downloads run ahead concurrently, only as far as the page still needs;
+    # results are checked in candidate order
+    downloads = fetcher.iter_downloads(candidates, lambda: 4 - page_filter.saved_count)
+    for img_info, img_content, download_error in downloads:
+        if page_filter.add(img_info, img_content, download_error):
+            # Pending downloads are cancelled
+            break
+    downloads.close()
+    return page_filter.temp_images
+
+def queue_page_images(fetcher, encoder, temp_images, index, dedupe=None):
+    """
+    Queue the encodes of the accepted images as {index}_{n} and index them for
+    near-duplicate detection. Returns the list of saved images as stored in
+    the 'images' field of the entry.
+    """
+    tracer = fetcher.tracer
+    saved_images = []
+    if temp_images:
+        target_size_per_image = 100 / len(temp_images)  # KB per image
+        print(f"\nQueued {len(temp_images)} images for compression (target: {target_size_per_image:.1f}KB each)...")
+        
+        # Encodes run in the encoder pool while the next URL loads
+        for img_data in temp_images:
+            # Numbered by the images actually kept, so a failed refetch leaves no gap
+            name = f'{index}_{len(saved_images) + 1}'
+            base_path = os.path.join('screenshots', name)
+            label = f"{img_data['width']}x{img_data['height']}"
+            
+            # A revalidated image has no bytes; fetch them only if its encode for this budget is gone
+            img_content = img_data['content']
+            if img_content is None and not encoder.submit_cached(img_data['hash'], target_size_per_image, base_path, label):
+                try:
+                    with tracer.span('download', outcome='refetch') as span:
+                        img_content = fetcher.fetch(img_data['src'])
+                        span['bytes_in'] = len(img_content)
+                except Exception as e:
+                    print(f"  Error downloading image: {str(e)}")
+                    continue
+            if img_content is not None:
+                encoder.submit(img_content, target_size_per_image, base_path, label, img_data['hash'])
+            if img_data['dhash'] is not None:
+                dedupe.add(name, index, img_data['hash'], img_data['dhash'])
+            
+            # Describe the planned derivatives for the viewer; correct_saved_images
+            # replaces these with the encoded sizes once the encodes are done
+            width, height = plan_output_size(img_data['width'], img_data['height'], target_size_per_image)
+            thumb_width, thumb_height = plan_thumb_size(width, height)
+            saved_images.append({
+                'name': name,
+                'width': width,
+                'height': height,
+                'thumb_width': thumb_width,
+                'thumb_height': thumb_height,
+                'formats': IMAGE_FORMATS
+            })
+    
+    forget_stale_images(index, [image['name'] for image in saved_images], dedupe)
+    print(f"Successfully collected {len(saved_images)} unique images for URL {index}")
+    return saved_images
+
+def forget_stale_images(index, names, dedupe=None, folder='screenshots'):
+    """
+    Delete the files and near-duplicate rows of the images an earlier run
+    saved for this page beyond the ones in names, so later pages are not
+    matched against images that are no longer listed.
+    """
+    if dedupe is not None:
+        dedupe.forget_page(index, names)
+    for n in range(len(names) + 1, 5):
+        for suffix in DERIVATIVE_SUFFIXES + ['.png']:
+            path = os.path.join(folder, f'{index}_{n}{suffix}')
+            if os.path.exists(path):
+                os.remove(path)
+
+def _screenshot_worker(slot, task_queue, result_queue, settings):
+    """
+    Worker process for --workers mode.
+    Owns one Chrome driver, started on the first page that needs it, and
+    keeps taking (index, url) tasks from its own queue until it receives None.
+    Every task produces exactly one (slot, result) message.
+    """
+    browser = LazyDriver(settings)
+    cache = open_image_cache(settings)
+    tracer = Tracer(settings['trace_path'], settings['run_id'])
+    fetcher = create_image_fetcher(settings, cache, tracer)
+    encoder = ImageEncoder(settings['encode_workers'], cache, tracer)
+    dedupe = open_dedupe_index(settings)
+    snapshots = open_snapshot_store(settings)
+    try:
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            index, url, total = task
+            result_queue.put((slot, run_task(browser, fetcher, encoder, index, url, total, settings, dedupe, snapshots)))
+    finally:
+        if dedupe is not None:
+            dedupe.close()
+        encoder.close()
+        fetcher.close()
+        tracer.close()
+        if cache is not None:
+            cache.close()
+        browser.quit()
+
+def apply_result(entries, result, results, ledger):
+    """
+    Merge a worker result into the entries and the job ledger.
+    The new title and image list are appended to the journal right away;
+    final_urls.json is only rewritten every JOURNAL_COMPACT_EVERY results.
+    """
+    results.append(result)
+    ledger.record(result)
+    record = {'index': result['index'], 'url': result['url']}
+    if result.get('title') is not None:
+        record['title'] = result['title']
+    if 'images' in result:
+        record['images'] = result['images']
+    if len(record) == 2:
+        return
+    apply_journal_record(entries, record)
+    
+    # Save to the journal immediately
+    try:
+        append_to_journal(record)
+        if len(results) % JOURNAL_COMPACT_EVERY == 0:
+            compact_journal(entries)
+    except Exception as save_error:
+        print(f"  Warning: Could not save title to JSON: {save_error}")
+
+def create_host_scheduler(urls, indices, settings):
+    """Create the HostScheduler for the selected URL indices, configured by the run settings"""
+    return HostScheduler([(index, urls[index]) for index in indices], settings['host_rate'],
+                         settings['host_concurrency'], settings['max_attempts'], settings['retry_backoff'])
+
+def finish_attempt(scheduler, attempt, result):
+    """Report a result to the scheduler; True if it is final, False if the URL was queued again"""
+    delay = scheduler.complete(result['index'], result['url'], attempt, result)
+    if delay is None:
+        return True
+    reason = result.get('error') or result.get('error_class')
+    print(f"  ↻ Retrying {result['index']} in {delay:.1f}s after {reason} "
+          f"(attempt {attempt + 1}/{scheduler.max_attempts})")
+    return False
+
+def run_worker_pool(entries, urls, scheduler, workers, settings, results, ledger):
+    """
+    Process the scheduled URLs with a pool of browser worker processes.
+    The scheduler hands out a URL whenever a worker is free and its host's
+    rate and concurrency limits allow it, so a slow page never holds up the
+    others. Each worker has its own task queue, so the URL of a worker that
+    dies (e.g. killed for memory) is failed and the worker replaced instead
+    of the run waiting for it forever. Only this process writes
+    final_urls.json, which keeps the title merges safe.
+    """
+    ctx = multiprocessing.get_context()
+    result_queue = ctx.Queue()
+    task_queues = [ctx.Queue() for _ in range(workers)]
+    processes = [None] * workers
+    
+    def start_worker(slot):
+        # Not daemonic: each worker owns its own encoder process pool
+        process = ctx.Process(target=_screenshot_worker, args=(slot, task_queues[slot], result_queue, settings))
+        process.start()
+        processes[slot] = process
+    
+    for slot in range(workers):
+        start_worker(slot)
+    
+    print(f"Started {workers} browser workers")
+    
+    drained = False
+    try:
+        busy = {}   # slot -> (index, url, attempt) of the task the worker is on
+        retired = set()     # slots whose worker exited without a task, not restarted
+        while scheduler.pending():
+            # Keep every worker busy with whatever the host limits allow
+            for slot in range(workers):
+                if slot in busy or slot in retired:
+                    continue
+                task = scheduler.next_task()
+                if task is None:
+                    break
+                busy[slot] = task
+                task_queues[slot].put((task[0], task[1], len(urls)))
             
-            # Add only new URLs that don't exist
-            added_count = 0
-            for new_url in cleaned_new_urls:
-                if new_url not in existing_urls:
-                    existing_entries.append({'url': new_url, 'title': ''})
-                    existing_urls.add(new_url)
-                    added_count += 1
+            # Fail the task of a worker that died and start a new worker in its place
+            for slot, process in enumerate(processes):
+                if process.is_alive() or slot in retired:
+                    continue
+                if slot not in busy:
+                    # Died without a task, e.g. at startup; restarting it would loop
+                    print(f"\n⚠ Worker {slot + 1} exited with code {process.exitcode}")
+                    retired.add(slot)
+                    continue
+                index, url, attempt = busy.pop(slot)
+                print(f"\n⚠ Worker {slot + 1} exited with code {process.exitcode} while processing {index}: {url}")
+                result = {'index': index, 'url': url, 'title': None, 'image_count': 0,
+                          'error': f'worker exited with code {process.exitcode}', 'error_class': 'WorkerExited'}
+                if finish_attempt(scheduler, attempt, result):
+                    apply_result(entries, result, results, ledger)
+                task_queues[slot] = ctx.Queue()
+                start_worker(slot)
+            if len(retired) == workers:
+                print(f"\n⚠ All workers exited with URLs unprocessed")
+                break
             
-            if added_count > 0:
-                with open('final_urls.json', 'w', encoding='utf-8') as f:
-                    json.dump({'urls': existing_entries}, f, indent=2, ensure_ascii=False)
-                print(f"✓ Added {added_count} new URLs to final_urls.json")
+            wait = scheduler.wait_time()
+            if not busy:
+                time.sleep(wait if wait is not None else 0.05)
+                continue
+            try:
+                # With every worker busy only a result can free a slot
+                timeout = 5.0 if wait is None or len(busy) >= workers else min(5.0, max(wait, 0.01))
+                slot, result = result_queue.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            if busy.get(slot, (None,))[0] != result['index']:
+                # The worker was already given up on
+                continue
+            if finish_attempt(scheduler, busy.pop(slot)[2], result):
+                apply_result(entries, result, results, ledger)
+        drained = True
+    finally:
+        for task_queue in task_queues:
+            task_queue.put(None)
+        for process in processes:
+            # After a clean run let each worker finish its queued encodes;
+            # only cut it short when the run was interrupted
+            process.join(timeout=None if drained else 10)
+            if process.is_alive():
+                process.terminate()
+
+@contextmanager
+def browser_session(settings):
+    """A LazyDriver for one render thread, quit when the thread ends"""
+    browser = LazyDriver(settings)
+    try:
+        yield browser
+    finally:
+        browser.quit()
+
+def run_pipeline(entries, urls, scheduler, settings, results, ledger):
+    """
+    Process the scheduled URLs in this process as a streaming pipeline:
+    ingest -> render -> fetch -> filter -> encode -> write.
+    Every stage has its own threads (encodes run in the encoder's process
+    pool) and hands pages on through a bounded queue, so Chrome is already
+    loading the next URL while the images of the previous ones are
+    downloaded, filtered and compressed. A full queue blocks the stage
+    before it, which bounds the pages and image bytes held in memory.
+    Pages the static tier cannot serve go back to the render stage.
+    Returns the sampled queue depths per stage.
+    """
+    cache = open_image_cache(settings)
+    tracer = Tracer(settings['trace_path'], settings['run_id'])
+    fetcher = create_image_fetcher(settings, cache, tracer)
+    dedupe = open_dedupe_index(settings)
+    snapshots = open_snapshot_store(settings)
+    finished = queue.Queue()
+    # Tasks whose page has loaded, so the scheduler can let the host's next page start
+    loaded = queue.Queue()
+    capacity = settings['queue_size']
+    
+    def finish(job):
+        result = job['result']
+        result['duration'] = time.monotonic() - job['started']
+        tracer.end_page(result)
+        finished.put((job['attempt'], result))
+    
+    def fail(job, error):
+        record_image_error(job['result'], error)
+        finish(job)
+    
+    def render_page(job, browser):
+        try:
+            load_page(job, browser)
+        finally:
+            loaded.put((job['index'], job['url'], job['attempt']))
+    
+    def load_page(job, browser):
+        tracer.enter_page(job['page'])
+        result = job['result']
+        if job['try_static']:
+            job['try_static'] = False
+            job['started'] = time.monotonic()
+            print(f"\nProcessing {job['index']}/{len(urls) - 1}: {job['url']}")
+            job['snapshot'] = {} if snapshots is not None else None
+            try:
+                escalation, title, candidates = load_static_page(fetcher, job['url'], settings, result, job['snapshot'])
+            except Exception as e:
+                escalation, title, candidates = f'error_{type(e).__name__}', None, None
+            if escalation is None:
+                if candidates is None:
+                    finish(job)
+                else:
+                    job.update(title=title, candidates=candidates, static=True)
+                    fetch.put(job)
+                return
+            escalate_to_browser(result, escalation)
+        job['snapshot'] = {} if snapshots is not None else None
+        candidates = load_browser_page(browser, fetcher, job['url'], settings, result, job['snapshot'])
+        if candidates is None:
+            finish(job)
+        else:
+            job.update(title=None, candidates=candidates, static=False)
+            fetch.put(job)
+    
+    def fetch_images(job, _):
+        tracer.enter_page(job['page'])
+        candidates = job.pop('candidates')
+        # One filter pass; a page escalated to the browser gets a new one
+        page = {'job': job, 'filter': PageFilter(fetcher, candidates, job['index'], dedupe),
+                'stop': threading.Event(), 'done': False, 'finished': False, 'sent': 0, 'checked': 0}
+        # Downloads waiting in the filter queue count towards the images still needed
+        needed = lambda: None if page['stop'].is_set() else 4 - page['filter'].saved_count - (page['sent'] - page['checked'])
+        downloads = fetcher.iter_downloads(candidates, needed)
+        try:
+            for item in downloads:
+                if page['stop'].is_set():
+                    break
+                page['sent'] += 1
+                filter_stage.put((page, item))
+        except Exception as e:
+            # The filter stage still completes the page with what it has
+            print(f"  Error downloading images: {str(e)}")
+        finally:
+            downloads.close()
+            filter_stage.put((page, None))
+    
+    def filter_image(entry, _):
+        page, item = entry
+        job = page['job']
+        tracer.enter_page(job['page'])
+        if item is not None:
+            page['checked'] += 1
+        if page['done'] or (item is not None and not page['filter'].add(*item)):
+            return
+        # Four images accepted or no downloads left: stop the fetch stage and queue the encodes
+        page['done'] = True
+        page['stop'].set()
+        temp_images, result = page['filter'].temp_images, job['result']
+        try:
+            if job['static']:
+                escalation = finish_static_page(fetcher, encoder, result, job['title'], temp_images, settings, dedupe)
+                if escalation is not None:
+                    escalate_to_browser(result, escalation)
+                    page['finished'] = True
+                    render.put(job, urgent=True)
+                    return
             else:
-                print("✓ No new URLs to add")
+                result['images'] = queue_page_images(fetcher, encoder, temp_images, job['index'], dedupe)
+                result['image_count'] = len(result['images'])
+            save_snapshot(snapshots, tracer, job['snapshot'], result, temp_images)
+        except Exception as e:
+            record_image_error(result, e)
+        page['finished'] = True
+        finish(job)
+    
+    def filter_error(entry, error):
+        # Also reached when completing a page raised; the job must still finish
+        page = entry[0]
+        page['done'] = True
+        page['stop'].set()
+        if not page['finished']:
+            page['finished'] = True
+            fail(page['job'], error)
+    
+    render = Stage('render', render_page, settings['render_workers'], capacity,
+                   context=lambda: browser_session(settings), on_error=fail)
+    fetch = Stage('fetch', fetch_images, settings['fetch_workers'], capacity, on_error=fail)
+    # Keyed by URL so the images of a page are filtered in order by one thread
+    filter_stage = Stage('filter', filter_image, settings['filter_workers'], capacity * 8,
+                         key=lambda entry: entry[0]['job']['index'], on_error=filter_error)
+    write = Stage('write', lambda item, _: encoder._write(*item), 1, capacity * 8)
+    encoder = ImageEncoder(settings['encode_workers'], cache, tracer, max_pending=capacity * 4,
+                           writer=lambda outputs, base_path, label: write.put((outputs, base_path, label)))
+    encode_slots = max(1, settings['encode_workers'])
+    sampler = DepthSampler({
+        'render': render.depth,
+        'fetch': fetch.depth,
+        'filter': filter_stage.depth,
+        'encode': lambda: (max(0, encoder.pending - encode_slots), min(encoder.pending, encode_slots)),
+        'write': write.depth,
+    })
+    stages = [render, fetch, filter_stage, write]
+    for stage in stages:
+        stage.start()
+    print(f"Pipeline: {settings['render_workers']} render, {settings['fetch_workers']} fetch, "
+          f"{settings['filter_workers']} filter, {settings['encode_workers']} encode workers")
+    
+    def release_loaded():
+        while True:
+            try:
+                scheduler.release(*loaded.get_nowait())
+            except queue.Empty:
+                return
+    
+    try:
+        while scheduler.pending():
+            release_loaded()
+            # Ingest: hand the render stage whatever its queue and the host limits allow
+            while not render.full():
+                task = scheduler.next_task()
+                if task is None:
+                    break
+                index, url, attempt = task
+                tracer.begin_page(index, url)
+                render.put({'index': index, 'url': url, 'attempt': attempt, 'page': tracer.page,
+                            'result': {'index': index, 'url': url, 'title': None, 'image_count': 0},
+                            'try_static': settings['static_min_images'] > 0, 'started': time.monotonic()})
+            sampler.sample()
+            try:
+                attempt, result = finished.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if finish_attempt(scheduler, attempt, result):
+                apply_result(entries, result, results, ledger)
+    finally:
+        # Drain the stages in order, then the encodes and their writes
+        for stage in stages[:-1]:
+            stage.close()
+        encoder.close()
+        write.close()
+        fetcher.close()
+        if dedupe is not None:
+            dedupe.close()
+        tracer.close()
+        if cache is not None:
+            cache.close()
+    return sampler.summary()
+
+def run_sequential(entries, urls, scheduler, settings, results, ledger):
+    """
+    Process the scheduled URLs one after another in this process, as used by
+    --profile-url so the whole page shows up in one profile.
+    """
+    # Initialize the image fetcher; Chrome starts when a page first needs it
+    browser = LazyDriver(settings)
+    cache = open_image_cache(settings)
+    tracer = Tracer(settings['trace_path'], settings['run_id'])
+    fetcher = create_image_fetcher(settings, cache, tracer)
+    encoder = ImageEncoder(settings['encode_workers'], cache, tracer)
+    dedupe = open_dedupe_index(settings)
+    snapshots = open_snapshot_store(settings)
+    try:
+        # Process the URLs in the order the scheduler allows and download images
+        while scheduler.pending():
+            task = scheduler.next_task()
+            if task is None:
+                time.sleep(scheduler.wait_time() or 0.05)
+                continue
+            index, url, attempt = task
+            run = lambda: run_task(browser, fetcher, encoder, index, url, len(urls), settings, dedupe, snapshots)
+            if settings['profile_index'] is not None:
+                result = profile_call(run, settings['profiler'], f'profile_{index}')
+            else:
+                result = run()
+            if finish_attempt(scheduler, attempt, result):
+                apply_result(entries, result, results, ledger)
+    finally:
+        # Finish the queued encodes and close the browser
+        if dedupe is not None:
+            dedupe.close()
+        encoder.close()
+        fetcher.close()
+        tracer.close()
+        if cache is not None:
+            cache.close()
+        browser.quit()
+
+def print_wait_summary(results, settings):
+    """Report how much wall clock the readiness strategy spent per URL"""
+    waits = [r['wait_seconds'] for r in results if 'wait_seconds' in r]
+    if not waits:
+        return
+    total = sum(waits)
+    print(f"\nPage readiness ({settings['readiness']}): {total:.1f}s total over {len(waits)} URLs, "
+          f"avg {total / len(waits):.2f}s, min {min(waits):.2f}s, max {max(waits):.2f}s")
+    if settings['readiness'] != 'fixed':
+        saved = 5 * len(waits) - total
+        print(f"  Compared to the fixed 5s sleep: {saved:+.1f}s saved")
+
+def print_tier_summary(results):
+    """Report how many URLs the static HTML served and why the others needed Chrome"""
+    tiers = Counter(r['tier'] for r in results if 'tier' in r)
+    total = sum(tiers.values())
+    if not total:
+        return
+    print(f"\nExtraction tiers: static HTML {tiers['static']} of {total} URLs ({tiers['static'] / total:.0%}), "
+          f"Chrome {tiers['browser']} ({tiers['browser'] / total:.0%})")
+    escalations = Counter(r['escalation'] for r in results if 'escalation' in r)
+    if escalations:
+        reasons = ', '.join(f"{reason} {count}" for reason, count in escalations.most_common())
+        print(f"  Escalated to Chrome: {reasons}")
+
+def print_host_summary(scheduler):
+    """Report the rates the scheduler settled on per host and the retries it made"""
+    hosts = scheduler.host_summary()
+    if not hosts:
+        return
+    print(f"\nHosts ({scheduler.retries} retries):")
+    for host, rate, concurrency, latency in hosts:
+        latency_text = f", avg load {latency:.1f}s" if latency is not None else ''
+        print(f"  {host:<28} {rate:.2f} pages/s, {concurrency} at a time{latency_text}")
+
+def print_queue_summary(queues):
+    """Report the sampled queue depths of the pipeline stages"""
+    if not queues:
+        return
+    print("\nPipeline queues (waiting avg/peak, busy workers avg/peak):")
+    for stage, depth in queues.items():
+        print(f"  {stage:<8} {depth['avg_queued']:5.1f} / {depth['max_queued']:<4} "
+              f"{depth['avg_busy']:5.1f} / {depth['max_busy']}")
+
+def print_run_metrics(settings, queues=None):
+    """Summarize this run's spans from the trace file and export them for Prometheus"""
+    if not settings['trace_path']:
+        return
+    summary = summarize_trace(settings['trace_path'], settings['run_id'])
+    if summary is None:
+        return
+    if queues:
+        summary['queues'] = queues
+    print_trace_summary(summary)
+    print(f"  Trace: {settings['trace_path']} (run {settings['run_id']})")
+    if settings['prometheus_path']:
+        try:
+            write_prometheus(summary, settings['prometheus_path'])
+            print(f"  ✓ Wrote metrics to {settings['prometheus_path']}")
+        except OSError as e:
+            print(f"  ⚠ Could not write {settings['prometheus_path']}: {str(e)}")
+
+def print_job_status(ledger):
+    """Print the job counts per status, failures per error class and timings"""
+    counts = ledger.counts()
+    total = sum(counts.values())
+    print(f"Jobs: {total} URLs")
+    for status in ('done', 'empty', 'failed', 'pending'):
+        print(f"  {status:<8} {counts.get(status, 0)}")
+    for error_class, count in ledger.error_classes():
+        print(f"  failed with {error_class or 'unknown error'}: {count}")
+    finished, average, total_seconds = ledger.timing()
+    if finished:
+        print(f"  {finished} timed jobs, avg {average:.1f}s, {total_seconds / 60:.1f} min total")
+
+def _saved_image_files(folder='screenshots'):
+    """{name: primary file} of the saved images, .jpg for current and .png for legacy ones"""
+    files = {}
+    for filename in os.listdir(folder):
+        match = re.fullmatch(r'(\d+_\d+)\.(jpg|png)', filename)
+        if match and (match.group(2) == 'jpg' or match.group(1) not in files):
+            files[match.group(1)] = filename
+    return files
+
+def dedupe_existing(apply=False, settings=DEFAULT_SETTINGS, folder='screenshots'):
+    """
+    Find near-duplicate images already in the screenshots folder.
+    Images are compared in index order, so the first copy of a photo is kept.
+    Without apply this only reports; with apply the copies and their
+    derivatives are deleted, removed from final_urls.json and the manifest,
+    and the kept images are written to the near-duplicate index so later
+    runs skip new copies of them.
+    """
+    if not os.path.isdir(folder):
+        print(f"{folder}/ not found.")
+        return
+    files = _saved_image_files(folder)
+    ordered = sorted(files, key=lambda name: tuple(int(part) for part in name.split('_')))
+    print(f"Hashing {len(ordered)} images in {folder}/...")
+    
+    # A fresh in-memory index, so a dry run changes nothing on disk
+    distance = settings['dedupe_distance']
+    seen = NearDuplicateIndex(':memory:', distance)
+    kept = []
+    duplicates = []
+    for name in ordered:
+        try:
+            with open(os.path.join(folder, files[name]), 'rb') as f:
+                content = f.read()
+            dhash = get_image_dhash(content)
+        except Exception as e:
+            print(f"  Warning: Could not hash {files[name]}: {str(e)}")
+            continue
+        match = seen.find(dhash)
+        if match:
+            duplicates.append(name)
+            print(f"  {name} is a near-duplicate of {match[0]} (distance {match[1]})")
+            continue
+        url_index = int(name.split('_')[0])
+        content_hash = get_image_hash(content)
+        seen.add(name, url_index, content_hash, dhash)
+        kept.append((name, url_index, content_hash, dhash))
+    seen.close()
+    
+    # Every file written for a duplicate: full size, thumbnails and all formats
+    removed = set(duplicates)
+    removed_files = [filename for filename in os.listdir(folder)
+                     if filename.split('.')[0].removesuffix('_thumb') in removed]
+    freed = sum(os.path.getsize(os.path.join(folder, filename)) for filename in removed_files)
+    print(f"Found {len(duplicates)} near-duplicates in {len(ordered)} images ({len(removed_files)} files, {freed / 1024:.1f}KB)")
+    if not apply:
+        if duplicates:
+            print("Dry run, nothing was changed. Run again with --apply to delete them.")
+        return
+    
+    for filename in removed_files:
+        os.remove(os.path.join(folder, filename))
+    
+    # Drop the deleted images from the entries and rebuild the manifest
+    recover_journal()
+    if duplicates and os.path.exists('final_urls.json'):
+        with open('final_urls.json', 'r', encoding='utf-8') as f:
+            entries = json.load(f).get('urls', [])
+        for entry in entries:
+            if isinstance(entry, dict) and 'images' in entry:
+                entry['images'] = [image for image in entry['images'] if image['name'] not in removed]
+        compact_journal(entries)
+    
+    index = NearDuplicateIndex(settings['ledger_path'], distance)
+    for name in duplicates:
+        index.remove(name)
+    for row in kept:
+        index.add(*row)
+    index.close()
+    print(f"✓ Deleted {len(removed_files)} files and indexed {len(kept)} images")
+
+# Set in each --reprocess worker process by _init_reprocess_worker
+_reprocess_fetcher = None
+_reprocess_dedupe = None
+
+def _init_reprocess_worker(settings):
+    """Open the image cache and near-duplicate index once per worker process"""
+    global _reprocess_fetcher, _reprocess_dedupe
+    cache = ImageCache(settings['cache_dir']) if settings['cache_dir'] else None
+    _reprocess_fetcher = SimpleNamespace(cache=cache, tracer=Tracer())
+    if settings['dedupe_distance'] is not None and os.path.exists(settings['ledger_path']):
+        _reprocess_dedupe = NearDuplicateIndex(settings['ledger_path'], settings['dedupe_distance'])
+
+class _SnapshotDedupe:
+    """
+    Read-only view of the near-duplicate index for reprocessing one page.
+    Which of two listings sharing a photo keeps it depends on the order the
+    pages finished in, so the images the page saved when it was snapshotted
+    are never reported as near duplicates of other listings.
+    """
+    
+    def __init__(self, index, kept_hashes):
+        self.index = index
+        self.max_distance = index.max_distance
+        self.kept = {index.dhash_for(content_hash) for content_hash in kept_hashes} - {None}
+    
+    def refresh(self):
+        pass
+    
+    def dhash_for(self, content_hash):
+        return self.index.dhash_for(content_hash)
+    
+    def find(self, dhash, exclude_index=None):
+        if dhash in self.kept:
+            return None
+        return self.index.find(dhash, exclude_index)
+
+def reprocess_snapshot(path):
+    """
+    Re-run title extraction and image selection on one stored snapshot, without
+    a browser or network. Candidates are judged by PageFilter on the verdicts
+    the image cache recorded when they were downloaded. A candidate without
+    cached verdicts was never downloaded (rejected from its headers), so it
+    stays rejected and is counted as unknown. Near duplicates are checked
+    against the images other listings saved (see _SnapshotDedupe).
+    """
+    snapshot = load_snapshot(path)
+    url = snapshot['url']
+    if snapshot['tier'] == 'static':
+        page = parse_static_page(snapshot['html'], url)
+        titles = [extract_title(title) for title in page['titles']] or [extract_title('')]
+        title = next((title for title in titles if not title.startswith('<bad>')), titles[0])
+        candidates = page['images']
+    else:
+        title = extract_title(snapshot.get('title') or '')
+        candidates = select_candidate_images(snapshot.get('harvested') or [], url)
+    
+    fetcher = _reprocess_fetcher
+    known = []
+    unknown = 0
+    for candidate in candidates:
+        entry = fetcher.cache.lookup(candidate['src']) if fetcher.cache is not None else None
+        if entry is not None:
+            known.append((candidate, entry))
         else:
-            # Create new file from urls.txt
-            entries = [{'url': url, 'title': ''} for url in cleaned_new_urls]
-            with open('final_urls.json', 'w', encoding='utf-8') as f:
-                json.dump({'urls': entries}, f, indent=2, ensure_ascii=False)
-            print(f"✓ Created final_urls.json with {len(entries)} URLs from urls.txt")
+            unknown += 1
+    if snapshot['tier'] == 'static':
+        # The static tier downloads the biggest files first
+        known.sort(key=lambda item: item[1]['size'], reverse=True)
+    dedupe = None
+    if _reprocess_dedupe is not None:
+        kept = {entry['content_hash'] for candidate, entry in known if candidate['src'] in snapshot.get('selected', [])}
+        dedupe = _SnapshotDedupe(_reprocess_dedupe, kept)
+    page_filter = PageFilter(fetcher, [candidate for candidate, _ in known], snapshot.get('index'), dedupe)
+    with redirect_stdout(StringIO()):
+        for candidate, entry in known:
+            if page_filter.add(candidate, None, NotModified(entry)):
+                break
+    return {'url': url, 'index': snapshot.get('index'), 'title': title,
+            'selected': [image['src'] for image in page_filter.temp_images],
+            'old_selected': snapshot.get('selected', []), 'unknown': unknown}
+
+def reprocess_snapshots(apply=False, settings=DEFAULT_SETTINGS, workers=None):
+    """
+    Re-run the title rules and image filters over every stored page snapshot,
+    spread over one process per core. Without apply this only reports what
+    would change; with apply the new titles are written to final_urls.json and
+    pages whose image selection changed are queued again in the job ledger.
+    """
+    folder = settings['snapshot_dir'] or '.snapshots'
+    if not os.path.isdir(folder):
+        print(f"{folder}/ not found, run the scraper with --snapshots first.")
+        return
+    paths = SnapshotStore(folder).paths()
+    if not paths:
+        print(f"No snapshots in {folder}/.")
+        return
+    recover_journal()
+    entries = []
+    if os.path.exists('final_urls.json'):
+        with open('final_urls.json', 'r', encoding='utf-8') as f:
+            entries = json.load(f).get('urls', [])
+    positions = {entry['url']: index for index, entry in enumerate(entries) if isinstance(entry, dict)}
+    
+    workers = workers or os.cpu_count() or 1
+    print(f"Reprocessing {len(paths)} snapshots from {folder}/ with {workers} processes...")
+    started = time.perf_counter()
+    with ProcessPoolExecutor(workers, initializer=_init_reprocess_worker, initargs=(settings,)) as pool:
+        outcomes = list(pool.map(reprocess_snapshot, paths, chunksize=max(1, len(paths) // (workers * 4))))
+    elapsed = time.perf_counter() - started
+    print(f"✓ Reprocessed {len(outcomes)} snapshots in {elapsed:.2f}s ({len(outcomes) / max(elapsed, 1e-6):.0f}/s)")
+    
+    title_changes = []
+    bad_before = bad_after = 0
+    for outcome in outcomes:
+        index = positions.get(outcome['url'])
+        old_title = entries[index].get('title') if index is not None else None
+        bad_before += bool(old_title and old_title.startswith('<bad>'))
+        bad_after += outcome['title'].startswith('<bad>')
+        if index is not None and old_title != outcome['title']:
+            title_changes.append((index, outcome['url'], old_title, outcome['title']))
+    selection_changes = [outcome['url'] for outcome in outcomes
+                         if set(outcome['selected']) != set(outcome['old_selected'])]
+    unknown = sum(outcome['unknown'] for outcome in outcomes)
+    
+    print(f"Titles changed: {len(title_changes)} (<bad> titles: {bad_before} → {bad_after})")
+    for index, _, old_title, new_title in title_changes[:10]:
+        print(f"  {index}: {old_title!r} → {new_title!r}")
+    if len(title_changes) > 10:
+        print(f"  ... and {len(title_changes) - 10} more")
+    print(f"Image selection changed: {len(selection_changes)} pages")
+    if unknown:
+        print(f"  {unknown} candidates were never downloaded and kept as rejected")
+    if not apply:
+        if title_changes or selection_changes:
+            print("Dry run, nothing was changed. Run again with --apply to write the titles and re-queue the pages.")
+        return
+    
+    for index, url, _, new_title in title_changes:
+        record = {'index': index, 'url': url, 'title': new_title}
+        apply_journal_record(entries, record, positions)
+        append_to_journal(record)
+    if title_changes:
+        compact_journal(entries)
+    ledger = JobLedger(settings['ledger_path'])
+    requeued = ledger.requeue(selection_changes)
+    ledger.close()
+    print(f"✓ Updated {len(title_changes)} titles and re-queued {requeued} pages for the next run")
+
+def get_webpage_screenshot(workers=1, mode='default', **overrides):
+    """
+    Reads URLs from final_urls.json and downloads the 4 biggest unique images from each webpage.
+    Only downloads images that are at least 400x600 pixels and 120KB in size.
+    Images are saved in the screenshots folder as {index}_{1-4}.jpg plus WebP/AVIF
+    variants and _thumb thumbnails, and listed in the 'images' field of the entry.
+    Resumes exactly where the last run stopped using the job ledger; mode
+    'retry-failed' re-runs failed and empty URLs, 'only-new' only URLs that
+    were never attempted.
+    With workers > 1, URLs are processed by that many browser worker processes.
+    Keyword overrides replace entries of DEFAULT_SETTINGS.
+    """
+    settings = dict(DEFAULT_SETTINGS, **overrides)
+    # Tags this run's spans in the trace file, which the workers share
+    settings['run_id'] = time.strftime('%Y%m%d-%H%M%S') + f'-{os.getpid()}'
+    if settings['trace_path']:
+        rotate_trace(settings['trace_path'])
+
+    # Finish the work of an interrupted run first
+    recover_journal()
+    
+    # Check if urls.txt exists and merge new listings
+    if os.path.exists('urls.txt'):
+        print("Checking urls.txt for new URLs...")
+        if not os.path.exists('final_urls.json'):
+            save_entries([])
+        lines, added_count, skipped = ingest_url_list('urls.txt', settings['ledger_path'])
+        if added_count > 0:
+            # Only rewrite final_urls.json when something was added
+            replay_journal()
+            print(f"✓ Added {added_count} new URLs to final_urls.json ({skipped} of {lines} lines already listed)")
+        else:
+            print(f"✓ No new URLs to add ({skipped} of {lines} lines already listed)")
     elif not os.path.exists('final_urls.json'):
         # Neither file exists
         print("Neither final_urls.json nor urls.txt found.")
-        with open('final_urls.json', 'w', encoding='utf-8') as f:
-            json.dump({'urls': []}, f, indent=2)
+        save_entries([])
         print("✓ Created empty final_urls.json")
         print("Please add URLs to the file and run again.")
         return
@@ -239,288 +2460,187 @@ def get_webpage_screenshot():
     if not os.path.exists('screenshots'):
         os.makedirs('screenshots')
     
-    # Find the highest index already processed
-    start_index = 0
-    existing_files = os.listdir('screenshots')
-    if existing_files:
-        # Extract indices from filenames like "3_1.png"
-        indices = []
-        for filename in existing_files:
-            if '_' in filename:
-                try:
-                    index = int(filename.split('_')[0])
-                    indices.append(index)
-                except:
-                    continue
-        
-        if indices:
-            start_index = max(indices)
-            print(f"Found existing images up to index {start_index}")
-            print(f"Resuming from index {start_index}...")
-    
-    # Set up Chrome options
-    chrome_options = Options()
-    chrome_options.add_argument('--headless=new')
-    chrome_options.add_argument('--disable-gpu')
-    chrome_options.add_argument('--no-sandbox')
-    chrome_options.add_argument('--disable-dev-shm-usage')
-    chrome_options.add_argument('--window-size=1920,1080')
-    chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-    chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
-    chrome_options.add_argument('--disable-software-rasterizer')
-    chrome_options.add_argument('--log-level=3')
-    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation", "enable-logging"])
-    chrome_options.add_experimental_option('useAutomationExtension', False)
-    
-    # Initialize the Chrome driver
-    driver = webdriver.Chrome(options=chrome_options)
-    driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+    # Pick the URLs to process from the job ledger
+    ledger = JobLedger(settings['ledger_path'])
+    ledger.sync(urls)
+    # Entries added to final_urls.json by hand are known listings too
+    keys = ListingKeyIndex(settings['ledger_path'])
+    keys.add_many(urls)
+    keys.close()
+    if ledger.is_new:
+        seeded = ledger.seed_from_screenshots(urls)
+        if seeded:
+            print(f"Created job ledger from existing images up to index {seeded}")
+    indices = ledger.select(mode)
+    if settings['profile_index'] is not None:
+        if not 0 <= settings['profile_index'] < len(urls):
+            print(f"No URL at index {settings['profile_index']}.")
+            ledger.close()
+            return
+        # One URL in this process, with the encodes inline so they show up in the profile
+        indices, workers = [settings['profile_index']], 1
+        settings['encode_workers'] = 0
+        mode = f"profiling with {settings['profiler']}"
+    print(f"{len(indices)} URLs to process ({mode})")
+    results = []
     
+    scheduler = create_host_scheduler(urls, indices, settings)
+    queues = None
     try:
-        # Iterate through URLs and download images, starting from start_index
-        for index in range(start_index, len(urls)):
-            url = urls[index]
-            try:
-                print(f"\nProcessing {index}/{len(urls)-1}: {url}")
-                
-                # Navigate to the URL
-                driver.get(url)
-                time.sleep(5)
-                
-                # Extract page title
-                try:
-                    page_title = driver.title
-                    
-                    # Split on both - and | to get all parts
-                    import re
-                    parts = re.split(r'[-|]', page_title)
-                    
-                    # Clean and strip all parts
-                    parts = [p.strip() for p in parts]
-                    
-                    # Find valid title: must have digit, comma, >5 letters before and after comma
-                    selected_title = ''
-                    is_valid = False
-                    for part in parts:
-                        if not part:
-                            continue
-                        
-                        # Check if part contains a digit
-                        if not any(char.isdigit() for char in part):
-                            continue
-                        
-                        # Check if part contains a comma
-                        if ',' not in part:
-                            continue
-                        
-                        # Split by comma
-                        comma_parts = part.split(',')
-                        if len(comma_parts) < 2:
-                            continue
-                        
-                        before_comma = comma_parts[0].strip()
-                        after_comma = comma_parts[1].strip()
-                        
-                        # Count alphabet characters before comma
-                        alpha_before = sum(1 for c in before_comma if c.isalpha())
-                        # Count alphabet characters after comma
-                        alpha_after = sum(1 for c in after_comma if c.isalpha())
-                        
-                        # Must have >5 alphabet chars before and after comma
-                        if alpha_before > 5 and alpha_after > 5:
-                            selected_title = part
-                            is_valid = True
-                            break
-                    
-                    # If no valid title found, use whole title with <bad> flag
-                    if not is_valid:
-                        # Remove double spacing from the whole title
-                        cleaned_title = re.sub(r'\s+', ' ', page_title).strip()
-                        page_title = f"<bad>{cleaned_title}"
-                        print(f"Title: {cleaned_title} (marked as bad)")
-                    else:
-                        page_title = selected_title.strip()
-                        print(f"Title: {page_title}")
-                    
-                    # Update the entry in the data structure
-                    entries[index]['title'] = page_title
-                    
-                    # Save to JSON immediately
-                    try:
-                        with open('final_urls.json', 'w', encoding='utf-8') as f:
-                            json.dump({'urls': entries}, f, indent=2, ensure_ascii=False)
-                    except Exception as save_error:
-                        print(f"  Warning: Could not save title to JSON: {save_error}")
-                except Exception as e:
-                    print(f"Could not extract title: {str(e)}")
-                
-                # Find all images and get their dimensions
-                images = driver.find_elements(By.TAG_NAME, 'img')
-                
-                # Filter images that meet minimum size requirements
-                valid_images = []
-                for img in images:
-                    try:
-                        src = img.get_attribute('src')
-                        width = img.size['width']
-                        height = img.size['height']
-                        
-                        # Check if image meets minimum size (400x600 or 600x400)
-                        if src and ((width >= 400 and height >= 600) or (width >= 600 and height >= 400)):
-                            img_url = urljoin(url, src)
-                            
-                            # Try to get file size via HEAD request
-                            file_size = 0
-                            try:
-                                head_response = requests.head(img_url, timeout=5, allow_redirects=True, headers={
-                                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                                })
-                                content_length = head_response.headers.get('content-length')
-                                if content_length:
-                                    file_size = int(content_length)
-                            except:
-                                pass
-                            
-                            # Only add if file size is at least 120KB, or if we couldn't determine size
-                            if file_size == 0 or file_size >= 120 * 1024:
-                                area = width * height
-                                valid_images.append({
-                                    'src': src,
-                                    'width': width,
-                                    'height': height,
-                                    'area': area,
-                                    'file_size': file_size
-                                })
-                            else:
-                                print(f"  Skipping: image too small ({file_size / 1024:.1f}KB)")
-                    except:
-                        continue
-                
-                # Sort by area (biggest first)
-                valid_images.sort(key=lambda x: x['area'], reverse=True)
-                
-                print(f"Found {len(valid_images)} valid images (>= 400x600)")
-                
-                # Download unique images
-                downloaded_hashes = set()
-                saved_count = 0
-                white_image_count = 0
-                temp_images = []  # Store images temporarily before compression
-                
-                for img_info in valid_images:
-                    if saved_count >= 4:
-                        break
-                    
-                    try:
-                        img_url = urljoin(url, img_info['src'])
-                        
-                        # Download the image
-                        response = requests.get(img_url, timeout=10, headers={
-                            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                        })
-                        response.raise_for_status()
-                        
-                        # Get image content
-                        img_content = response.content
-                        
-                        # Check file size (must be at least 120KB)
-                        content_size = len(img_content)
-                        if content_size < 120 * 1024:
-                            print(f"  Skipping: downloaded file too small ({content_size / 1024:.1f}KB)")
-                            continue
-                        
-                        # Check if image is duplicate
-                        img_hash = get_image_hash(img_content)
-                        if img_hash in downloaded_hashes:
-                            print(f"  Skipping duplicate image")
-                            continue
-                        
-                        # Check if image is mostly white
-                        if is_image_mostly_white(img_content):
-                            white_image_count += 1
-                            # Only skip if we have other images or will have other images
-                            # If this is our only chance and we have no saved images yet, keep it
-                            if saved_count > 0 or (len(valid_images) - valid_images.index(img_info) > 1):
-                                print(f"  Skipping: image is mostly white (>50%)")
-                                continue
-                            else:
-                                print(f"  Warning: Keeping mostly-white image (only option available)")
-                        
-                        # Verify actual image dimensions
-                        try:
-                            img_obj = Image.open(BytesIO(img_content))
-                            actual_width, actual_height = img_obj.size
-                            
-                            # Verify it meets minimum size requirements
-                            if not ((actual_width >= 400 and actual_height >= 600) or 
-                                   (actual_width >= 600 and actual_height >= 400)):
-                                print(f"  Skipping: actual size {actual_width}x{actual_height} too small")
-                                continue
-                            
-                            # Check if image is too square
-                            if is_image_too_square(actual_width, actual_height):
-                                # Only skip if we have other images or will have other images
-                                if saved_count > 0 or (len(valid_images) - valid_images.index(img_info) > 1):
-                                    aspect_ratio = max(actual_width, actual_height) / min(actual_width, actual_height)
-                                    print(f"  Skipping: image too square (aspect ratio {aspect_ratio:.2f})")
-                                    continue
-                                else:
-                                    print(f"  Warning: Keeping square image (only option available)")
-                        except:
-                            print(f"  Skipping: cannot verify image")
-                            continue
-                        
-                        # Store image temporarily (will compress after collecting all images)
-                        saved_count += 1
-                        temp_images.append({
-                            'content': img_content,
-                            'width': actual_width,
-                            'height': actual_height,
-                            'original_size': content_size
-                        })
-                        
-                        downloaded_hashes.add(img_hash)
-                        print(f"  Collected: image {saved_count} ({actual_width}x{actual_height}, {content_size / 1024:.1f}KB)")
-                        
-                    except Exception as e:
-                        print(f"  Error downloading image: {str(e)}")
-                        continue
-                
-                # Now compress and save all collected images
-                if temp_images:
-                    target_size_per_image = 100 / len(temp_images)  # KB per image
-                    print(f"\nCompressing {len(temp_images)} images (target: {target_size_per_image:.1f}KB each)...")
-                    
-                    for idx, img_data in enumerate(temp_images, 1):
-                        compressed_content = compress_image(img_data['content'], target_size_per_image)
-                        
-                        # Save the compressed image
-                        img_path = os.path.join('screenshots', f'{index}_{idx}.png')
-                        with open(img_path, 'wb') as f:
-                            f.write(compressed_content)
-                        
-                        compressed_size = len(compressed_content) / 1024
-                        print(f"  Saved: {index}_{idx}.png ({img_data['width']}x{img_data['height']}, {compressed_size:.1f}KB)")
-                
-                print(f"Successfully saved {len(temp_images)} unique images for URL {index}")
-                
-            except Exception as e:
-                print(f"Error processing {url}: {str(e)}")
-                continue
+        if workers > 1:
+            run_worker_pool(entries, urls, scheduler, workers, settings, results, ledger)
+        elif settings['profile_index'] is not None:
+            run_sequential(entries, urls, scheduler, settings, results, ledger)
+        else:
+            queues = run_pipeline(entries, urls, scheduler, settings, results, ledger)
     
     finally:
-        # Close the browser
-        driver.quit()
-        
-        # Save updated titles back to JSON
+        # The encoders are done, record what they actually wrote
+        written = {}
+        for result in results:
+            if not result.get('images'):
+                continue
+            queued = len(result['images'])
+            correct_saved_images(result['images'])
+            result['image_count'] = len(result['images'])
+            if not result.get('error'):
+                written[result['url']] = (result['image_count'], queued)
+        ledger.settle(written)
+        # Compact the journaled titles into final_urls.json
         try:
-            with open('final_urls.json', 'w', encoding='utf-8') as f:
-                json.dump({'urls': entries}, f, indent=2, ensure_ascii=False)
+            compact_journal(entries)
             print("\n✓ Saved updated titles to final_urls.json")
         except Exception as e:
             print(f"\n⚠ Could not save titles: {str(e)}")
     
-    print(f"\nCompleted! Processed {len(urls)} URLs.")
+    print_wait_summary(results, settings)
+    print_tier_summary(results)
+    print_host_summary(scheduler)
+    print_queue_summary(queues)
+    print_run_metrics(settings, queues)
+    print(f"\nCompleted! Processed {len(results)} of {len(urls)} URLs.")
+    print_job_status(ledger)
+    ledger.close()
 
 if __name__ == "__main__":
-    get_webpage_screenshot()
+    parser = argparse.ArgumentParser(description='Download the biggest property images for every URL in final_urls.json')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of parallel browser worker processes; 1 runs the staged pipeline (default: 1)')
+    parser.add_argument('--readiness', choices=sorted(READINESS_STRATEGIES), default=DEFAULT_SETTINGS['readiness'],
+                        help='how to decide a page has finished loading (default: adaptive)')
+    parser.add_argument('--ready-timeout', type=float, default=DEFAULT_SETTINGS['ready_timeout'],
+                        help='maximum seconds to wait for a page with the adaptive strategy')
+    parser.add_argument('--scroll', action='store_true',
+                        help='scroll through each page to trigger lazy-loaded images')
+    parser.add_argument('--max-connections', type=int, default=DEFAULT_SETTINGS['max_connections'],
+                        help='concurrent image requests per browser worker (default: 16)')
+    parser.add_argument('--host-connections', type=int, default=DEFAULT_SETTINGS['host_connections'],
+                        help='concurrent image requests per host (default: 4)')
+    parser.add_argument('--encode-workers', type=int, default=DEFAULT_SETTINGS['encode_workers'],
+                        help='compression processes per browser worker, 0 compresses inline (default: 2)')
+    parser.add_argument('--cache-dir', default=DEFAULT_SETTINGS['cache_dir'],
+                        help='image cache shared across runs (default: .image_cache)')
+    parser.add_argument('--cache-max-mb', type=float, default=DEFAULT_SETTINGS['cache_max_mb'],
+                        help='size limit of the cached encodes in MB (default: 500)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='download and encode every image again')
+    parser.add_argument('--retry-failed', action='store_const', dest='mode', const='retry-failed', default='default',
+                        help='only re-run URLs that failed or yielded no images')
+    parser.add_argument('--only-new', action='store_const', dest='mode', const='only-new',
+                        help='only run URLs that were never attempted')
+    parser.add_argument('--status', action='store_true',
+                        help='print the job ledger status and exit')
+    parser.add_argument('--manifest', action='store_true',
+                        help='rebuild manifest.json for index.html and exit')
+    parser.add_argument('--host-rate', type=float, default=DEFAULT_SETTINGS['host_rate'],
+                        help='max page loads per second per host, adapted to latency and errors (default: 1.0)')
+    parser.add_argument('--host-concurrency', type=int, default=DEFAULT_SETTINGS['host_concurrency'],
+                        help='max parallel page loads per host (default: 2)')
+    parser.add_argument('--max-attempts', type=int, default=DEFAULT_SETTINGS['max_attempts'],
+                        help='attempts per URL for 429/5xx responses and transient errors (default: 3)')
+    parser.add_argument('--render-workers', type=int, default=DEFAULT_SETTINGS['render_workers'],
+                        help='pipeline threads loading pages, each with its own Chrome (default: 1)')
+    parser.add_argument('--fetch-workers', type=int, default=DEFAULT_SETTINGS['fetch_workers'],
+                        help='pipeline threads downloading the images of a page (default: 2)')
+    parser.add_argument('--filter-workers', type=int, default=DEFAULT_SETTINGS['filter_workers'],
+                        help='pipeline threads running the image filters (default: 1)')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_SETTINGS['queue_size'],
+                        help='pages waiting between two pipeline stages before the earlier one blocks (default: 2)')
+    parser.add_argument('--static-min-images', type=int, default=DEFAULT_SETTINGS['static_min_images'],
+                        help='images the raw HTML must yield before Chrome is skipped for a page (default: 4)')
+    parser.add_argument('--no-static', action='store_true',
+                        help='load every page in Chrome, without trying the raw HTML first')
+    parser.add_argument('--cdp', action='store_true',
+                        help='take image bytes from Chrome via CDP instead of downloading them again, blocking fonts, video, maps and trackers')
+    parser.add_argument('--blocklist', default=DEFAULT_SETTINGS['blocklist_path'], metavar='FILE',
+                        help='extra URL patterns Chrome should not load with --cdp, one per line (default: blocklist.txt)')
+    parser.add_argument('--no-block', action='store_true',
+                        help='with --cdp, capture images without blocking any requests')
+    parser.add_argument('--dedupe-distance', type=int, default=DEFAULT_SETTINGS['dedupe_distance'],
+                        help='max differing perceptual hash bits for a near-duplicate image (default: 6)')
+    parser.add_argument('--no-dedupe', action='store_true',
+                        help='only skip exact duplicate images within a page')
+    parser.add_argument('--trace', default=DEFAULT_SETTINGS['trace_path'],
+                        help='JSONL file the per-stage spans of this run are written to; the previous run\'s '
+                             'file is kept as NAME.1.jsonl (default: run_trace.jsonl)')
+    parser.add_argument('--no-trace', action='store_true',
+                        help='do not record spans or print the stage summary')
+    parser.add_argument('--prometheus', default='', metavar='PATH',
+                        help='write the run metrics to a Prometheus textfile (e.g. for node_exporter)')
+    parser.add_argument('--profile-url', type=int, metavar='INDEX',
+                        help='process only the URL at INDEX under a profiler and exit')
+    parser.add_argument('--profiler', choices=['cprofile', 'pyinstrument'], default=DEFAULT_SETTINGS['profiler'],
+                        help='profiler used by --profile-url (default: cprofile)')
+    parser.add_argument('--dedupe-existing', action='store_true',
+                        help='report near-duplicate images in screenshots/ and exit')
+    parser.add_argument('--snapshots', action='store_true',
+                        help='save a compressed snapshot of every processed page for --reprocess')
+    parser.add_argument('--snapshot-dir', default='.snapshots', metavar='DIR',
+                        help='folder of the page snapshots (default: .snapshots)')
+    parser.add_argument('--reprocess', action='store_true',
+                        help='re-run the title rules and image filters on the stored snapshots and exit')
+    parser.add_argument('--apply', action='store_true',
+                        help='with --dedupe-existing, delete the duplicates and index the kept images; '
+                             'with --reprocess, write the new titles and re-queue pages whose images changed')
+    args = parser.parse_args()
+    if args.manifest:
+        rebuild_manifest()
+        raise SystemExit(0)
+    if args.dedupe_existing:
+        dedupe_existing(args.apply, dict(DEFAULT_SETTINGS, dedupe_distance=args.dedupe_distance))
+        raise SystemExit(0)
+    if args.reprocess:
+        reprocess_snapshots(args.apply, dict(DEFAULT_SETTINGS, snapshot_dir=args.snapshot_dir,
+                                             cache_dir='' if args.no_cache else args.cache_dir,
+                                             dedupe_distance=None if args.no_dedupe else max(0, args.dedupe_distance)))
+        raise SystemExit(0)
+    if args.status:
+        if not os.path.exists(DEFAULT_SETTINGS['ledger_path']):
+            print("No job ledger yet, run the scraper first.")
+        else:
+            ledger = JobLedger(DEFAULT_SETTINGS['ledger_path'])
+            print_job_status(ledger)
+            ledger.close()
+        raise SystemExit(0)
+    get_webpage_screenshot(workers=max(1, args.workers), mode=args.mode, readiness=args.readiness,
+                           ready_timeout=args.ready_timeout, scroll=args.scroll,
+                           max_connections=max(1, args.max_connections),
+                           host_connections=max(1, args.host_connections),
+                           encode_workers=max(0, args.encode_workers),
+                           cache_dir='' if args.no_cache else args.cache_dir,
+                           cache_max_mb=args.cache_max_mb,
+                           dedupe_distance=None if args.no_dedupe else max(0, args.dedupe_distance),
+                           trace_path='' if args.no_trace else args.trace,
+                           prometheus_path=args.prometheus,
+                           profile_index=args.profile_url, profiler=args.profiler,
+                           host_rate=max(0.01, args.host_rate),
+                           host_concurrency=max(1, args.host_concurrency),
+                           max_attempts=max(1, args.max_attempts),
+                           static_min_images=0 if args.no_static else max(1, args.static_min_images),
+                           render_workers=max(1, args.render_workers),
+                           fetch_workers=max(1, args.fetch_workers),
+                           filter_workers=max(1, args.filter_workers),
+                           queue_size=max(1, args.queue_size),
+                           network_capture=args.cdp, block_resources=not args.no_block,
+                           blocklist_path=args.blocklist,
+                           snapshot_dir=args.snapshot_dir if args.snapshots else '')
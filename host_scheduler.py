@@ -0,0 +1,164 @@
+import random
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+# Page statuses that mean the host is overloaded or throttling us
+THROTTLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Error classes worth another attempt: timeouts, dropped connections, browser hiccups
+TRANSIENT_ERRORS = {'TimeoutException', 'WebDriverException', 'ConnectionError', 'Timeout',
+                    'ReadTimeout', 'ConnectTimeout', 'ChunkedEncodingError'}
+
+class HostState:
+    """Rate, concurrency and queue of one host, adapted with AIMD"""
+
+    def __init__(self, host, max_rate, max_concurrency):
+        self.host = host
+        self.queue = deque()            # [index, url, attempt, not_before]
+        self.in_flight = 0              # started and not completed
+        self.loading = 0                # started and still holding a page load slot
+        self.max_rate = max_rate
+        self.max_concurrency = max_concurrency
+        # Start at half speed and earn the rest
+        self.rate = max_rate / 2
+        self.concurrency = 1
+        self.next_start = 0.0
+        self.latency = None             # EWMA of the page load + readiness seconds
+        self.successes = 0
+
+    def ready_item(self, now):
+        """Position of the first queued task whose backoff has passed, or None"""
+        for position, item in enumerate(self.queue):
+            if item[3] <= now:
+                return position
+        return None
+
+class HostScheduler:
+    """
+    Politeness scheduler for page loads.
+    URLs are grouped by host and handed out round-robin across hosts, so a
+    run of consecutive danbolig.dk URLs no longer hits one host back to
+    back. Each host has a concurrency limit on page loads (a task can
+    release its slot once its page has loaded) and a minimum interval
+    between starts. Both adapt with AIMD: every clean result raises the rate
+    additively, while slow pages (latency well above the host's average)
+    and 429/5xx or transient errors cut it multiplicatively. Transient
+    failures are retried up to max_attempts with jittered exponential backoff.
+    """
+
+    def __init__(self, tasks, max_rate=1.0, max_concurrency=2, max_attempts=3, backoff=5.0,
+                 clock=time.monotonic, rng=None):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.hosts = {}
+        for index, url in tasks:
+            host = urlparse(url).netloc.lower()
+            if host not in self.hosts:
+                self.hosts[host] = HostState(host, max_rate, max_concurrency)
+            self.hosts[host].queue.append([index, url, 1, 0.0])
+        self.order = list(self.hosts)
+        self.cursor = 0
+        self.retries = 0
+        self.holding = set()            # (index, attempt) of tasks holding a page load slot
+
+    def pending(self):
+        """True while tasks are queued or running"""
+        return any(state.queue or state.in_flight for state in self.hosts.values())
+
+    def next_task(self):
+        """(index, url, attempt) of the next task allowed to start now, or None"""
+        now = self.clock()
+        for step in range(len(self.order)):
+            state = self.hosts[self.order[(self.cursor + step) % len(self.order)]]
+            if state.loading >= state.concurrency or now < state.next_start:
+                continue
+            position = state.ready_item(now)
+            if position is None:
+                continue
+            index, url, attempt, _ = state.queue[position]
+            del state.queue[position]
+            state.in_flight += 1
+            state.loading += 1
+            self.holding.add((index, attempt))
+            state.next_start = now + 1.0 / state.rate
+            # Continue with the next host next time
+            self.cursor = (self.cursor + step + 1) % len(self.order)
+            return index, url, attempt
+        return None
+
+    def wait_time(self):
+        """Seconds until a queued task may start, None if only a completion can free one"""
+        now = self.clock()
+        waits = []
+        for state in self.hosts.values():
+            if not state.queue or state.loading >= state.concurrency:
+                continue
+            earliest = min(item[3] for item in state.queue)
+            waits.append(max(state.next_start, earliest) - now)
+        return max(0.0, min(waits)) if waits else None
+
+    def _backoff_delay(self, attempt):
+        # Jittered so retries of one host do not line up: half to all of the exponential bound
+        return self.rng.uniform(0.5, 1.0) * self.backoff * 2 ** (attempt - 1)
+
+    def release(self, index, url, attempt):
+        """
+        Free the page load slot of a started task whose page has loaded, so
+        the host's next page can load while this one's images are processed.
+        complete() must still be called; releasing twice is harmless.
+        """
+        if (index, attempt) in self.holding:
+            self.holding.discard((index, attempt))
+            self.hosts[urlparse(url).netloc.lower()].loading -= 1
+
+    def complete(self, index, url, attempt, result):
+        """
+        Feed back the result of a started task, releasing its slot if it
+        still holds one. Returns the retry delay in seconds when the task was
+        queued again, None when the result is final.
+        """
+        self.release(index, url, attempt)
+        state = self.hosts[urlparse(url).netloc.lower()]
+        state.in_flight -= 1
+        now = self.clock()
+        status = result.get('status')
+        throttled = status in THROTTLE_STATUSES
+        transient = throttled or result.get('error_class') in TRANSIENT_ERRORS
+
+        latency = result.get('load_seconds')
+        slow = False
+        if latency is not None and not transient:
+            slow = state.latency is not None and state.successes >= 3 and latency > 2 * state.latency
+            state.latency = latency if state.latency is None else 0.8 * state.latency + 0.2 * latency
+
+        if transient:
+            # Multiplicative decrease, and keep the host quiet for a while
+            state.rate = max(state.max_rate / 20, state.rate / 2)
+            state.concurrency = max(1, state.concurrency // 2)
+            state.successes = 0
+            if throttled:
+                state.next_start = max(state.next_start, now + self._backoff_delay(attempt))
+        elif slow:
+            state.rate = max(state.max_rate / 20, state.rate * 0.75)
+            state.successes = 0
+        elif not result.get('error'):
+            # Additive increase towards the configured limits
+            state.rate = min(state.max_rate, state.rate + state.max_rate / 10)
+            state.successes += 1
+            if state.successes % 5 == 0:
+                state.concurrency = min(state.max_concurrency, state.concurrency + 1)
+
+        if transient and attempt < self.max_attempts:
+            delay = self._backoff_delay(attempt)
+            state.queue.append([index, url, attempt + 1, now + delay])
+            self.retries += 1
+            return delay
+        return None
+
+    def host_summary(self):
+        """(host, rate per second, concurrency, latency EWMA) for every host"""
+        return [(state.host, state.rate, state.concurrency, state.latency)
+                for state in sorted(self.hosts.values(), key=lambda state: state.host)]
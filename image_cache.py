@@ -0,0 +1,157 @@
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+# Part of the key of every cached encode; bump it when the encoder's outputs
+# change so encodes of older versions are no longer served
+ENCODE_VERSION = 2
+
+class ImageCache:
+    """
+    Persistent on-disk cache for scraped images, shared across runs.
+    Per image URL it remembers the ETag/Last-Modified validators, the content
+    hash from get_image_hash and the filter verdicts (size, dimensions,
+    mostly white), so an unchanged image can be revalidated with a
+    conditional request instead of being downloaded again.
+    Compressed outputs are stored per (content hash, byte budget) and
+    evicted least-recently-used once the cache grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir='.image_cache', max_bytes=500 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(cache_dir, 'encodes'), exist_ok=True)
+        # Shared by the fetch threads and the encoder callbacks of one process;
+        # worker processes open their own connection to the same file
+        self.conn = sqlite3.connect(os.path.join(cache_dir, 'index.db'), timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self.conn:
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT,
+                size INTEGER,
+                width INTEGER,
+                height INTEGER,
+                mostly_white INTEGER,
+                last_used REAL)''')
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS encodes (
+                content_hash TEXT,
+                budget TEXT,
+                bytes INTEGER,
+                last_used REAL,
+                PRIMARY KEY (content_hash, budget))''')
+
+    def lookup(self, url):
+        """Cached response for url as a dict, only if its verdicts are complete"""
+        with self._lock:
+            row = self.conn.execute('SELECT * FROM responses WHERE url = ? AND size IS NOT NULL', (url,)).fetchone()
+        return dict(row) if row else None
+
+    def conditional_headers(self, url):
+        """If-None-Match/If-Modified-Since headers for url, empty if it can't be revalidated"""
+        entry = self.lookup(url)
+        headers = {}
+        if entry and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store_validators(self, url, etag, last_modified, content_hash):
+        """
+        Record a fresh 200 response; the verdicts are reset if the bytes
+        changed. A response without validators keeps the stored ones while
+        the bytes are the same, so it can still be revalidated next time.
+        """
+        with self._lock, self.conn:
+            self.conn.execute('''INSERT INTO responses (url, etag, last_modified, content_hash, last_used)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    size = CASE WHEN content_hash = excluded.content_hash THEN size END,
+                    width = CASE WHEN content_hash = excluded.content_hash THEN width END,
+                    height = CASE WHEN content_hash = excluded.content_hash THEN height END,
+                    mostly_white = CASE WHEN content_hash = excluded.content_hash THEN mostly_white END,
+                    etag = CASE WHEN excluded.etag IS NULL AND content_hash = excluded.content_hash
+                                THEN etag ELSE excluded.etag END,
+                    last_modified = CASE WHEN excluded.last_modified IS NULL AND content_hash = excluded.content_hash
+                                         THEN last_modified ELSE excluded.last_modified END,
+                    content_hash = excluded.content_hash,
+                    last_used = excluded.last_used''',
+                (url, etag, last_modified, content_hash, time.time()))
+
+    def store_verdicts(self, url, size, width, height, mostly_white):
+        """Record the filter verdicts of a downloaded image"""
+        with self._lock, self.conn:
+            self.conn.execute('UPDATE responses SET size = ?, width = ?, height = ?, mostly_white = ?, last_used = ? WHERE url = ?',
+                              (size, width, height, int(mostly_white), time.time(), url))
+
+    def _encode_dir(self, content_hash, budget):
+        return os.path.join(self.cache_dir, 'encodes', content_hash[:2], f'{content_hash}_{budget}')
+
+    @staticmethod
+    def budget_key(target_size_kb):
+        return f'v{ENCODE_VERSION}-{target_size_kb:.1f}'
+
+    def has_encode(self, content_hash, target_size_kb):
+        with self._lock:
+            row = self.conn.execute('SELECT 1 FROM encodes WHERE content_hash = ? AND budget = ?',
+                                    (content_hash, self.budget_key(target_size_kb))).fetchone()
+        return row is not None
+
+    def get_encode(self, content_hash, target_size_kb):
+        """Cached {file suffix: bytes} outputs for an image and byte budget, None on a miss"""
+        budget = self.budget_key(target_size_kb)
+        if not self.has_encode(content_hash, target_size_kb):
+            return None
+        encode_dir = self._encode_dir(content_hash, budget)
+        try:
+            outputs = {}
+            for suffix in os.listdir(encode_dir):
+                with open(os.path.join(encode_dir, suffix), 'rb') as f:
+                    outputs[suffix] = f.read()
+        except OSError:
+            # Files were evicted by another process
+            return None
+        with self._lock, self.conn:
+            self.conn.execute('UPDATE encodes SET last_used = ? WHERE content_hash = ? AND budget = ?',
+                              (time.time(), content_hash, budget))
+        return outputs or None
+
+    def put_encode(self, content_hash, target_size_kb, outputs):
+        """Store the outputs of an encode and evict old ones past max_bytes"""
+        budget = self.budget_key(target_size_kb)
+        encode_dir = self._encode_dir(content_hash, budget)
+        os.makedirs(encode_dir, exist_ok=True)
+        for suffix, content in outputs.items():
+            with open(os.path.join(encode_dir, suffix), 'wb') as f:
+                f.write(content)
+        total = sum(len(content) for content in outputs.values())
+        with self._lock, self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO encodes (content_hash, budget, bytes, last_used) VALUES (?, ?, ?, ?)',
+                              (content_hash, budget, total, time.time()))
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used encodes until the cache fits max_bytes"""
+        with self._lock:
+            used = self.conn.execute('SELECT COALESCE(SUM(bytes), 0) FROM encodes').fetchone()[0]
+            if used <= self.max_bytes:
+                return
+            victims = []
+            for row in self.conn.execute('SELECT content_hash, budget, bytes FROM encodes ORDER BY last_used'):
+                if used <= self.max_bytes:
+                    break
+                victims.append((row['content_hash'], row['budget']))
+                used -= row['bytes']
+            with self.conn:
+                self.conn.executemany('DELETE FROM encodes WHERE content_hash = ? AND budget = ?', victims)
+        for content_hash, budget in victims:
+            shutil.rmtree(self._encode_dir(content_hash, budget), ignore_errors=True)
+
+    def close(self):
+        self.conn.close()
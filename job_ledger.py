@@ -0,0 +1,148 @@
+import os
+import sqlite3
+import time
+
+# Job states: pending (never finished, or not all its images written), done (images
+# saved), empty (page loaded but no image passed the filters), failed (an error
+# stopped the page)
+PENDING, DONE, EMPTY, FAILED = 'pending', 'done', 'empty', 'failed'
+
+class JobLedger:
+    """
+    SQLite-backed ledger with one job per URL in final_urls.json.
+    Records status, attempt count, timings, error class and image count, so
+    a run can be killed and resumed exactly, and failed or empty URLs can be
+    retried on purpose instead of being skipped forever.
+    """
+
+    def __init__(self, path='scraper_state.db'):
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        with self.conn:
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS jobs (
+                url TEXT PRIMARY KEY,
+                url_index INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                started_at REAL,
+                finished_at REAL,
+                duration REAL,
+                error_class TEXT,
+                error TEXT,
+                image_count INTEGER NOT NULL DEFAULT 0)''')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, url_index)')
+        # The database file may already exist for the listing key and near-duplicate
+        # tables, so a new ledger is one without jobs
+        self.is_new = self.conn.execute('SELECT 1 FROM jobs LIMIT 1').fetchone() is None
+
+    def sync(self, urls):
+        """
+        Add a pending job for every new URL and keep the indices in step with
+        final_urls.json. Jobs of URLs no longer in the list are dropped, so a
+        stale row can never share its index with a live URL.
+        """
+        with self.conn:
+            self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS current_urls (url TEXT PRIMARY KEY)')
+            self.conn.execute('DELETE FROM current_urls')
+            self.conn.executemany('INSERT OR IGNORE INTO current_urls (url) VALUES (?)', ((url,) for url in urls))
+            self.conn.execute('DELETE FROM jobs WHERE url NOT IN (SELECT url FROM current_urls)')
+            self.conn.executemany('''INSERT INTO jobs (url, url_index) VALUES (?, ?)
+                ON CONFLICT(url) DO UPDATE SET url_index = excluded.url_index
+                WHERE url_index != excluded.url_index''',
+                ((url, index) for index, url in enumerate(urls)))
+
+    def seed_from_screenshots(self, urls, folder='screenshots'):
+        """
+        One-time migration from the old filename-based resume.
+        Indices below the highest {index}_ prefix were processed: those with
+        files are done, the others are marked empty so --retry-failed picks
+        them up. The highest index itself was re-processed by the old resume,
+        so it stays pending.
+        """
+        if not os.path.isdir(folder):
+            return 0
+        with_files = set()
+        for filename in os.listdir(folder):
+            prefix = filename.split('_')[0]
+            if prefix.isdigit():
+                with_files.add(int(prefix))
+        if not with_files:
+            return 0
+        last_index = min(max(with_files), len(urls))
+        with self.conn:
+            self.conn.executemany('UPDATE jobs SET status = ?, attempts = 1 WHERE url = ?',
+                ((DONE if index in with_files else EMPTY, urls[index]) for index in range(last_index)))
+        return last_index
+
+    def select(self, mode='default'):
+        """
+        Indices to process, in order.
+        default: jobs that never finished (new or interrupted)
+        retry-failed: failed and empty jobs
+        only-new: jobs that were never attempted
+        """
+        if mode == 'retry-failed':
+            query = 'SELECT url_index FROM jobs WHERE status IN (?, ?) ORDER BY url_index'
+            params = (FAILED, EMPTY)
+        elif mode == 'only-new':
+            query = 'SELECT url_index FROM jobs WHERE status = ? AND attempts = 0 ORDER BY url_index'
+            params = (PENDING,)
+        else:
+            query = 'SELECT url_index FROM jobs WHERE status = ? ORDER BY url_index'
+            params = (PENDING,)
+        return [row[0] for row in self.conn.execute(query, params)]
+
+    def record(self, result):
+        """
+        Store the outcome of one processed URL. A URL with images stays
+        pending until settle() confirms their encodes were written, so a run
+        killed mid-encode processes it again.
+        """
+        if result.get('error'):
+            status = FAILED
+        elif result.get('image_count'):
+            status = PENDING
+        else:
+            status = EMPTY
+        finished_at = time.time()
+        duration = result.get('duration')
+        with self.conn:
+            self.conn.execute('''UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?,
+                finished_at = ?, duration = ?, error_class = ?, error = ?, image_count = ? WHERE url = ?''',
+                (status, finished_at - duration if duration is not None else None, finished_at, duration,
+                 result.get('error_class'), result.get('error'), result.get('image_count', 0), result['url']))
+        return status
+
+    def settle(self, written):
+        """
+        Finish the jobs recorded with images from {url: (images written,
+        images queued)}: done with the written count if every encode was
+        written, otherwise left pending for the next run.
+        """
+        with self.conn:
+            self.conn.executemany('UPDATE jobs SET status = ?, image_count = ? WHERE url = ? AND status = ?',
+                ((DONE if count == queued else PENDING, count, url, PENDING)
+                 for url, (count, queued) in written.items()))
+
+    def requeue(self, urls):
+        """Mark finished jobs pending again so the next default run processes them; returns how many"""
+        with self.conn:
+            cursor = self.conn.executemany('UPDATE jobs SET status = ? WHERE url = ? AND status != ?',
+                                           ((PENDING, url, PENDING) for url in urls))
+        return cursor.rowcount
+
+    def counts(self):
+        """Number of jobs per status"""
+        return dict(self.conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+
+    def error_classes(self):
+        """Number of failed jobs per error class, most frequent first"""
+        return self.conn.execute('''SELECT error_class, COUNT(*) FROM jobs WHERE status = ?
+            GROUP BY error_class ORDER BY COUNT(*) DESC''', (FAILED,)).fetchall()
+
+    def timing(self):
+        """(finished jobs, average duration, total duration) over jobs with recorded timings"""
+        return tuple(self.conn.execute('SELECT COUNT(duration), AVG(duration), SUM(duration) FROM jobs').fetchone())
+
+    def close(self):
+        self.conn.close()
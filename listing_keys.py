@@ -0,0 +1,75 @@
+import json
+import re
+import sqlite3
+from urllib.parse import urlparse
+
+# Portal host (without www.) -> pattern of the listing ID embedded in the URL path
+LISTING_ID_PATTERNS = {
+    'danbolig.dk': re.compile(r'/(\d{10}-\d{3})(?:/|$)'),               # /villa/6030000131-603/
+    'edc.dk': re.compile(r'/(\d{8})(?:/|$)'),                           # /ulkestrupvej-8/44505866/
+    'nybolig.dk': re.compile(r'/n\d+/(n?\d+)(?:/|$)'),                  # /n270214/n2702140000393
+    'estate.dk': re.compile(r'/n\d+/(n?\d+)(?:/|$)'),                   # same scheme as nybolig
+    'home.dk': re.compile(r'/(sag-\d+)(?:/|$)'),                        # /ny-harloesevej-7-3320-skaevinge/sag-1150002443/
+    'realmaeglerne.dk': re.compile(r'/bolig/(\d+(?:-\d+)?)(?:-|/|$)'),  # /bolig/370-6264-flinterupvej-5-bjerge
+    'peterduebolig.dk': re.compile(r'/bolig/(\d+)(?:/|$)'),             # /bolig/35000000544/hedeborydevej-10-4293-dianalund
+    'minbolighandel.dk': re.compile(r'/sag/([a-z]+\d+)(?:/|$)', re.I),  # /sag/HS688/kildemarksvej-24-4200-slagelse
+}
+
+def listing_key(url):
+    """
+    Stable key of the listing a URL points to, e.g. 'danbolig.dk:6030000131-603'.
+    Tracking parameters, anchors, the scheme, www. and the address slug do
+    not change the key. URLs of other sites, or without a recognised ID,
+    are keyed by host and path.
+    """
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower().removeprefix('www.')
+    pattern = LISTING_ID_PATTERNS.get(host)
+    match = pattern.search(parsed.path) if pattern else None
+    if match:
+        return f'{host}:{match.group(1).lower()}'
+    return f"url:{host}{parsed.path.rstrip('/')}"
+
+class ListingKeyIndex:
+    """
+    On-disk set of the listing keys already in final_urls.json, in the
+    listing_keys table of the job ledger database. Ingesting a URL list
+    checks each batch of lines against it, so the same house reached through
+    different URLs is only added once and memory use does not grow with the
+    size of the input or the corpus.
+    """
+
+    def __init__(self, path='scraper_state.db'):
+        self.conn = sqlite3.connect(path, timeout=30)
+        with self.conn:
+            self.conn.execute('CREATE TABLE IF NOT EXISTS listing_keys (key TEXT PRIMARY KEY, url TEXT NOT NULL)')
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM listing_keys').fetchone()[0]
+
+    def known(self, keys):
+        """The subset of keys that are already indexed"""
+        keys = list(keys)
+        found = set()
+        # Stay below SQLite's limit on bound parameters
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            found.update(row[0] for row in self.conn.execute(
+                f"SELECT key FROM listing_keys WHERE key IN ({','.join('?' * len(chunk))})", chunk))
+        return found
+
+    def add_many(self, urls):
+        """Index the keys of urls; a key that is already indexed keeps its first URL"""
+        with self.conn:
+            self.conn.executemany('INSERT OR IGNORE INTO listing_keys (key, url) VALUES (?, ?)',
+                                  ((listing_key(url), url) for url in urls))
+
+    def seed_from_entries(self, path='final_urls.json'):
+        """Index every URL of an existing final_urls.json; returns the number of entries read"""
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = json.load(f).get('urls', [])
+        self.add_many(entry['url'] if isinstance(entry, dict) else entry for entry in entries)
+        return len(entries)
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,151 @@
+import sqlite3
+import threading
+
+# SQLite integers are signed 64-bit, perceptual hashes are unsigned
+_SIGN_BIT = 1 << 63
+_HASH_MASK = (1 << 64) - 1
+
+def _to_signed(value):
+    return value - (1 << 64) if value & _SIGN_BIT else value
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+class BKTree:
+    """
+    Burkhard-Keller tree over 64-bit hashes with the Hamming distance.
+    A lookup within a small radius only visits the children whose edge
+    distance is within that radius of the query distance, instead of
+    comparing against every stored hash.
+    """
+
+    def __init__(self):
+        self.root = None  # [hash, values, {distance: child}]
+
+    def add(self, value_hash, value):
+        if self.root is None:
+            self.root = [value_hash, [value], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming_distance(value_hash, node[0])
+            if distance == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value_hash, [value], {}]
+                return
+            node = child
+
+    def search(self, value_hash, max_distance):
+        """(distance, value) pairs within max_distance of value_hash, closest first"""
+        matches = []
+        pending = [self.root] if self.root is not None else []
+        while pending:
+            node = pending.pop()
+            distance = hamming_distance(value_hash, node[0])
+            if distance <= max_distance:
+                matches.extend((distance, value) for value in node[1])
+            for edge, child in node[2].items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    pending.append(child)
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+class NearDuplicateIndex:
+    """
+    Persistent perceptual-hash index of every saved image in the corpus.
+    Rows live in the image_hashes table of the job ledger database and are
+    mirrored in a BK-tree for fast Hamming-distance lookups, so re-encoded or
+    resized copies of a photo (e.g. the same house listed on several portals)
+    are recognised across pages and runs. Worker processes share the table
+    and pick up each other's rows with refresh().
+    """
+
+    def __init__(self, path='scraper_state.db', max_distance=6):
+        self.max_distance = max_distance
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.tree = BKTree()
+        self.names = {}  # name -> (url_index, content_hash, dhash) of the rows still present
+        self.by_content = {}  # content_hash -> dhash
+        self.last_rowid = 0
+        with self._lock, self.conn:
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS image_hashes (
+                name TEXT PRIMARY KEY,
+                url_index INTEGER NOT NULL,
+                content_hash TEXT,
+                dhash INTEGER NOT NULL)''')
+        self.refresh()
+
+    def refresh(self):
+        """Load the rows added since the last refresh, including other processes' rows"""
+        with self._lock:
+            rows = self.conn.execute('''SELECT rowid, name, url_index, content_hash, dhash FROM image_hashes
+                WHERE rowid > ? ORDER BY rowid''', (self.last_rowid,)).fetchall()
+            for rowid, name, url_index, content_hash, dhash in rows:
+                # Rows added by this process are already in the tree
+                if self.names.get(name) != (url_index, content_hash, dhash & _HASH_MASK):
+                    self._remember(name, url_index, content_hash, dhash & _HASH_MASK)
+                self.last_rowid = rowid
+        return len(rows)
+
+    def _remember(self, name, url_index, content_hash, dhash):
+        self.tree.add(dhash, (name, dhash))
+        self.names[name] = (url_index, content_hash, dhash)
+        if content_hash:
+            self.by_content[content_hash] = dhash
+
+    def __len__(self):
+        return len(self.names)
+
+    def dhash_for(self, content_hash):
+        """Stored perceptual hash of an image with these exact bytes, None if unknown"""
+        return self.by_content.get(content_hash)
+
+    def find(self, dhash, exclude_index=None):
+        """(name, distance) of the closest indexed image within max_distance, or None"""
+        with self._lock:
+            for distance, (name, indexed_hash) in self.tree.search(dhash, self.max_distance):
+                # Forgotten pages and replaced names leave stale nodes in the tree
+                row = self.names.get(name)
+                if row is None or row[2] != indexed_hash or row[0] == exclude_index:
+                    continue
+                if self._stored(name, indexed_hash):
+                    return name, distance
+        return None
+
+    def _stored(self, name, dhash):
+        # Another process may have dropped the row since this one loaded it
+        return self.conn.execute('SELECT 1 FROM image_hashes WHERE name = ? AND dhash = ?',
+                                 (name, _to_signed(dhash))).fetchone() is not None
+
+    def add(self, name, url_index, content_hash, dhash):
+        """Index a saved image, replacing an older image of the same name"""
+        with self._lock:
+            with self.conn:
+                self.conn.execute('''INSERT OR REPLACE INTO image_hashes (name, url_index, content_hash, dhash)
+                    VALUES (?, ?, ?, ?)''', (name, url_index, content_hash, _to_signed(dhash)))
+            self._remember(name, url_index, content_hash, dhash)
+
+    def remove(self, name):
+        """Drop one image, e.g. after deleting a duplicate file"""
+        with self._lock:
+            with self.conn:
+                self.conn.execute('DELETE FROM image_hashes WHERE name = ?', (name,))
+            self.names.pop(name, None)
+
+    def forget_page(self, url_index, keep_names):
+        """Drop the images of a page that are not in keep_names, after the page was processed again"""
+        keep_names = list(keep_names)
+        with self._lock:
+            with self.conn:
+                self.conn.execute(f"""DELETE FROM image_hashes WHERE url_index = ?
+                    AND name NOT IN ({','.join('?' * len(keep_names))})""", [url_index, *keep_names])
+            for name, row in list(self.names.items()):
+                if row[0] == url_index and name not in keep_names:
+                    del self.names[name]
+
+    def close(self):
+        self.conn.close()
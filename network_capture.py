@@ -0,0 +1,109 @@
+import base64
+import json
+import os
+
+# URL patterns Chrome is told not to load: fonts, video, map tiles, trackers and ads.
+# Stylesheets and scripts stay, the rendered image sizes and lazy galleries depend on them.
+DEFAULT_BLOCKLIST = [
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.mp4', '*.webm', '*.m3u8', '*.mov',
+    '*fonts.googleapis.com*', '*fonts.gstatic.com*', '*use.typekit.net*',
+    '*maps.googleapis.com*', '*maps.gstatic.com*', '*tile.openstreetmap.org*', '*api.mapbox.com*',
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*', '*googlesyndication.com*',
+    '*connect.facebook.net*', '*facebook.com/tr*', '*hotjar.com*', '*clarity.ms*', '*cookiebot.com*',
+    '*cookieinformation.com*', '*youtube.com/embed*', '*player.vimeo.com*', '*siteimprove.com*',
+]
+
+# Chrome keeps response bodies in these buffers until they are read or evicted
+MAX_TOTAL_BUFFER = 256 * 1024 * 1024
+MAX_RESOURCE_BUFFER = 32 * 1024 * 1024
+
+def load_blocklist(path='blocklist.txt'):
+    """DEFAULT_BLOCKLIST plus the patterns in path (one per line, # comments), if it exists"""
+    patterns = list(DEFAULT_BLOCKLIST)
+    if path and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#') and line not in patterns:
+                    patterns.append(line)
+    return patterns
+
+def enable_network_capture(driver, blocklist):
+    """
+    Turn on the CDP Network domain of a driver started with performance
+    logging, with large body buffers, and block the URL patterns in blocklist.
+    """
+    driver.execute_cdp_cmd('Network.enable', {'maxTotalBufferSize': MAX_TOTAL_BUFFER,
+                                              'maxResourceBufferSize': MAX_RESOURCE_BUFFER})
+    if blocklist:
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': blocklist})
+
+class NetworkCapture:
+    """
+    Image responses of the current page, read from Chrome's network layer.
+    Call reset() before loading a page and collect() once it is ready; body()
+    then returns the bytes Chrome already downloaded for an image URL through
+    Network.getResponseBody, so the gallery is not fetched a second time.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.images = {}    # url -> requestId of a finished 200 image response
+        self.headers = {}   # url -> response headers of a captured image
+        self.blocked = 0
+
+    def _events(self):
+        for entry in self.driver.get_log('performance'):
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, TypeError, ValueError):
+                continue
+            yield message.get('method'), message.get('params', {})
+
+    def reset(self):
+        """Drop the events and bodies of the previous page"""
+        for _ in self._events():
+            pass
+        self.images = {}
+        self.headers = {}
+        self.blocked = 0
+
+    def collect(self):
+        """Read the events logged since reset(); returns the number of captured images"""
+        responses = {}
+        for method, params in self._events():
+            if method == 'Network.responseReceived':
+                response = params.get('response', {})
+                if params.get('type') == 'Image' and response.get('status') == 200:
+                    responses[params['requestId']] = (response.get('url'), response.get('headers') or {})
+            elif method == 'Network.loadingFinished':
+                url, headers = responses.pop(params.get('requestId'), (None, None))
+                if url and not url.startswith('data:'):
+                    self.images[url] = params['requestId']
+                    self.headers[url] = headers
+            elif method == 'Network.loadingFailed':
+                responses.pop(params.get('requestId'), None)
+                if params.get('blockedReason'):
+                    self.blocked += 1
+        return len(self.images)
+
+    def validators(self, url):
+        """(ETag, Last-Modified) of the captured response for url, None for a missing header"""
+        # HTTP/2 responses have lowercase header names
+        headers = {name.lower(): value for name, value in self.headers.get(url, {}).items()}
+        return headers.get('etag'), headers.get('last-modified')
+
+    def body(self, url):
+        """Bytes of the captured response for url, None if it was not captured or evicted"""
+        request_id = self.images.get(url)
+        if request_id is None:
+            return None
+        try:
+            response = self.driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+        except Exception:
+            # Evicted from the buffer or the target is gone, download it instead
+            return None
+        if response.get('base64Encoded'):
+            return base64.b64decode(response['body'])
+        return response['body'].encode('latin-1')
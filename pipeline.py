@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+_STOP = object()
+
+class StageQueue:
+    """
+    Bounded FIFO between two stages. put() blocks while the queue is full,
+    which is what keeps a fast stage from running ahead of a slow one.
+    Urgent items go to the front and ignore the bound, so a later stage can
+    hand work back to an earlier one without deadlocking on a full queue.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = max(1, capacity)
+        self.items = deque()
+        self._cond = threading.Condition()
+
+    def put(self, item, urgent=False):
+        with self._cond:
+            if urgent:
+                self.items.appendleft(item)
+            else:
+                while len(self.items) >= self.capacity:
+                    self._cond.wait()
+                self.items.append(item)
+            self._cond.notify_all()
+
+    def _put_stop(self):
+        with self._cond:
+            self.items.append(_STOP)
+            self._cond.notify_all()
+
+    def get(self):
+        with self._cond:
+            while not self.items:
+                self._cond.wait()
+            item = self.items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def full(self):
+        with self._cond:
+            return len(self.items) >= self.capacity
+
+    def __len__(self):
+        return len(self.items)
+
+class Stage:
+    """
+    A named pool of worker threads running handler(item, context) on the items
+    of a bounded input queue. context comes from the per-thread context
+    manager factory (e.g. one browser per render thread), None without one.
+    With a key function every worker has its own queue and items with the
+    same key always go to the same worker, in order. A handler exception is
+    passed to on_error(item, exception) so no item is silently dropped.
+    """
+
+    def __init__(self, name, handler, workers=1, capacity=4, key=None, context=None, on_error=None):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.key = key
+        self.context = context
+        self.on_error = on_error
+        self.inboxes = [StageQueue(capacity) for _ in range(self.workers if key else 1)]
+        self.busy = 0
+        self._lock = threading.Lock()
+        self.threads = []
+
+    def start(self):
+        for number in range(self.workers):
+            inbox = self.inboxes[number % len(self.inboxes)]
+            thread = threading.Thread(target=self._work, args=(inbox,), name=f'{self.name}-{number}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def _inbox(self, item):
+        return self.inboxes[self.key(item) % len(self.inboxes)] if self.key else self.inboxes[0]
+
+    def put(self, item, urgent=False):
+        """Queue item for this stage, blocking while its queue is full unless urgent"""
+        self._inbox(item).put(item, urgent)
+
+    def full(self):
+        return any(inbox.full() for inbox in self.inboxes)
+
+    def depth(self):
+        """(items queued, items being handled)"""
+        return sum(len(inbox) for inbox in self.inboxes), self.busy
+
+    def _work(self, inbox):
+        with (self.context() if self.context else nullcontext()) as context:
+            while True:
+                item = inbox.get()
+                if item is _STOP:
+                    return
+                with self._lock:
+                    self.busy += 1
+                try:
+                    self.handler(item, context)
+                except Exception as e:
+                    if self.on_error is None:
+                        raise
+                    self.on_error(item, e)
+                finally:
+                    with self._lock:
+                        self.busy -= 1
+
+    def close(self):
+        """Let the workers finish the queued items, then stop them"""
+        for number in range(len(self.threads)):
+            # Keyed stages have one queue per worker, the others share one
+            self.inboxes[number % len(self.inboxes)]._put_stop()
+        for thread in self.threads:
+            thread.join()
+
+class DepthSampler:
+    """Samples the queue depth of every stage over a run for the average and peak"""
+
+    def __init__(self, probes):
+        self.probes = probes    # name -> function returning (queued, busy)
+        self.samples = 0
+        self.totals = {name: [0, 0] for name in probes}
+        self.peaks = {name: [0, 0] for name in probes}
+        self.last = 0.0
+
+    def sample(self, interval=0.1):
+        """Record the current depths, at most once per interval seconds"""
+        now = time.monotonic()
+        if now - self.last < interval:
+            return
+        self.last = now
+        self.samples += 1
+        for name, probe in self.probes.items():
+            depths = probe()
+            for position, value in enumerate(depths):
+                self.totals[name][position] += value
+                self.peaks[name][position] = max(self.peaks[name][position], value)
+
+    def summary(self):
+        """name -> {'avg_queued', 'max_queued', 'avg_busy', 'max_busy'}"""
+        samples = max(1, self.samples)
+        return {name: {'avg_queued': self.totals[name][0] / samples, 'max_queued': self.peaks[name][0],
+                       'avg_busy': self.totals[name][1] / samples, 'max_busy': self.peaks[name][1]}
+                for name in self.probes}
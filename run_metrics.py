@@ -0,0 +1,243 @@
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+class Tracer:
+    """
+    Structured per-stage timing for a scraper process.
+    Every span (page load, readiness wait, harvest, each download, white
+    check, encode, ...) becomes one JSON line in the trace file, tagged
+    with the run id and the URL it belongs to. Worker processes append to the
+    same file; each line is written with a single O_APPEND write so lines from
+    different processes never interleave. With path=None nothing is written.
+    The current page is tracked per thread, so pipeline stages working on
+    different URLs attribute their spans correctly.
+    """
+
+    def __init__(self, path=None, run_id=None):
+        self.run_id = run_id
+        self._local = threading.local()
+        self._rejected = {}     # page index -> Counter of rejection reasons
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644) if path else None
+
+    @property
+    def page(self):
+        """The page the calling thread is working on"""
+        return getattr(self._local, 'page', {'index': None, 'url': None})
+
+    def begin_page(self, index, url):
+        """Start attributing spans and rejections to the URL at index"""
+        self.enter_page({'index': index, 'url': url})
+        with self._lock:
+            self._rejected[index] = Counter()
+
+    def enter_page(self, page):
+        """Continue a page started with begin_page in the calling thread"""
+        self._local.page = page
+
+    def reject(self, reason):
+        """Count an image of the current page rejected for reason"""
+        with self._lock:
+            self._rejected.setdefault(self.page['index'], Counter())[reason] += 1
+
+    def emit(self, stage, seconds, page=None, **attrs):
+        if self._fd is None:
+            return
+        record = {'run': self.run_id, 'pid': os.getpid(), 'stage': stage,
+                  'at': round(time.time(), 3), 'seconds': round(seconds, 6)}
+        record.update(page or self.page)
+        record.update(attrs)
+        line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        with self._lock:
+            os.write(self._fd, line)
+
+    @contextmanager
+    def span(self, stage, page=None, **attrs):
+        """
+        Time the enclosed block as one span of stage. The yielded dict holds
+        the span's attributes (e.g. bytes_in, bytes_out, outcome) and can be
+        filled in by the block. An exception is recorded as the error class.
+        """
+        page = page or self.page
+        started = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs.setdefault('error', type(e).__name__)
+            raise
+        finally:
+            self.emit(stage, time.perf_counter() - started, page, **attrs)
+
+    def end_page(self, result):
+        """Write the whole-URL span with its outcome and rejected images by reason"""
+        with self._lock:
+            rejected = self._rejected.pop(result['index'], {})
+        self.emit('url', result.get('duration', 0.0), {'index': result['index'], 'url': result['url']},
+                  image_count=result.get('image_count', 0), error=result.get('error_class'),
+                  tier=result.get('tier'), rejected=dict(rejected))
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+def rotate_trace(path, keep=1):
+    """
+    Start a run with an empty trace file: the current file becomes
+    {name}.1.jsonl, older ones shift up and only keep of them are kept, so
+    the trace does not grow without bound and only holds the current run.
+    """
+    root, ext = os.path.splitext(path)
+    for number in range(keep, 0, -1):
+        source = path if number == 1 else f'{root}.{number - 1}{ext}'
+        if os.path.exists(source):
+            os.replace(source, f'{root}.{number}{ext}')
+    if keep < 1 and os.path.exists(path):
+        os.remove(path)
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    rank = max(1, int(round(fraction * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize_trace(path, run_id):
+    """
+    Aggregate the spans of one run: per stage the count, total, p50/p90/p99
+    and max seconds and the bytes in/out, plus URL outcomes, the extraction
+    tier that served each URL and rejected images by reason.
+    """
+    durations = {}
+    stages = {}
+    rejected = Counter()
+    outcomes = Counter()
+    tiers = Counter()
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('run') != run_id:
+                continue
+            stage = record['stage']
+            durations.setdefault(stage, []).append(record['seconds'])
+            totals = stages.setdefault(stage, {'bytes_in': 0, 'bytes_out': 0, 'errors': 0})
+            totals['bytes_in'] += record.get('bytes_in', 0)
+            totals['bytes_out'] += record.get('bytes_out', 0)
+            if record.get('error'):
+                totals['errors'] += 1
+            if stage == 'url':
+                rejected.update(record.get('rejected', {}))
+                if record.get('tier'):
+                    tiers[record['tier']] += 1
+                if record.get('error'):
+                    outcomes['failed'] += 1
+                else:
+                    outcomes['done' if record.get('image_count') else 'empty'] += 1
+    if not durations:
+        return None
+    for stage, values in durations.items():
+        values.sort()
+        stages[stage].update(count=len(values), total=sum(values), p50=percentile(values, 0.5),
+                             p90=percentile(values, 0.9), p99=percentile(values, 0.99), max=values[-1])
+    return {'run': run_id, 'stages': stages, 'rejected': dict(rejected), 'outcomes': dict(outcomes),
+            'tiers': dict(tiers)}
+
+def print_trace_summary(summary):
+    """Print the per-stage table and the rejection counts of a run summary"""
+    print(f"\nStage timings (run {summary['run']}):")
+    print(f"  {'stage':<13}{'count':>7}{'total s':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'in MB':>9}{'out MB':>9}")
+    for stage, stats in sorted(summary['stages'].items(), key=lambda item: -item[1]['total']):
+        print(f"  {stage:<13}{stats['count']:>7}{stats['total']:>10.1f}{stats['p50'] * 1000:>10.1f}"
+              f"{stats['p90'] * 1000:>10.1f}{stats['p99'] * 1000:>10.1f}"
+              f"{stats['bytes_in'] / 1e6:>9.2f}{stats['bytes_out'] / 1e6:>9.2f}")
+    if summary['rejected']:
+        reasons = ', '.join(f"{reason} {count}" for reason, count in
+                            sorted(summary['rejected'].items(), key=lambda item: -item[1]))
+        print(f"  Rejected images: {reasons}")
+
+def write_prometheus(summary, path):
+    """
+    Export a run summary in the Prometheus text format, for the node_exporter
+    textfile collector. The file is replaced atomically.
+    """
+    lines = [
+        '# HELP scraper_stage_seconds Latency of one scraper stage span.',
+        '# TYPE scraper_stage_seconds summary',
+    ]
+    for stage, stats in sorted(summary['stages'].items()):
+        for key, quantile in (('p50', '0.5'), ('p90', '0.9'), ('p99', '0.99')):
+            lines.append(f'scraper_stage_seconds{{stage="{stage}",quantile="{quantile}"}} {stats[key]:.6f}')
+        lines.append(f'scraper_stage_seconds_sum{{stage="{stage}"}} {stats["total"]:.6f}')
+        lines.append(f'scraper_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+    lines += ['# HELP scraper_stage_bytes_total Bytes read and written by a scraper stage.',
+              '# TYPE scraper_stage_bytes_total counter']
+    for stage, stats in sorted(summary['stages'].items()):
+        for direction in ('in', 'out'):
+            if stats[f'bytes_{direction}']:
+                lines.append(f'scraper_stage_bytes_total{{stage="{stage}",direction="{direction}"}} {stats[f"bytes_{direction}"]}')
+    lines += ['# HELP scraper_images_rejected_total Images rejected by the filters, by reason.',
+              '# TYPE scraper_images_rejected_total counter']
+    for reason, count in sorted(summary['rejected'].items()):
+        lines.append(f'scraper_images_rejected_total{{reason="{reason}"}} {count}')
+    lines += ['# HELP scraper_urls_total Processed URLs by outcome.',
+              '# TYPE scraper_urls_total counter']
+    for outcome, count in sorted(summary['outcomes'].items()):
+        lines.append(f'scraper_urls_total{{outcome="{outcome}"}} {count}')
+    lines += ['# HELP scraper_urls_by_tier_total Processed URLs by the extraction tier that served them.',
+              '# TYPE scraper_urls_by_tier_total counter']
+    for tier, count in sorted(summary.get('tiers', {}).items()):
+        lines.append(f'scraper_urls_by_tier_total{{tier="{tier}"}} {count}')
+    if summary.get('queues'):
+        lines += ['# HELP scraper_queue_depth Items waiting for or handled by a pipeline stage, sampled over the run.',
+                  '# TYPE scraper_queue_depth gauge']
+        for stage, depth in sorted(summary['queues'].items()):
+            for stat, value in sorted(depth.items()):
+                lines.append(f'scraper_queue_depth{{stage="{stage}",stat="{stat}"}} {value:.3f}')
+    lines += ['# HELP scraper_last_run_timestamp_seconds End of the last scraper run.',
+              '# TYPE scraper_last_run_timestamp_seconds gauge',
+              f'scraper_last_run_timestamp_seconds {time.time():.0f}']
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(temp_path, path)
+
+def profile_call(func, profiler='cprofile', output='profile'):
+    """
+    Run func under cProfile or pyinstrument and return its result.
+    cProfile stats go to output.prof (open with snakeviz or pstats) and the
+    top functions are printed; pyinstrument writes output.html.
+    """
+    if profiler == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("pyinstrument is not installed (pip install pyinstrument), using cProfile")
+            profiler = 'cprofile'
+        else:
+            instrument = Profiler()
+            instrument.start()
+            try:
+                return func()
+            finally:
+                instrument.stop()
+                with open(output + '.html', 'w', encoding='utf-8') as f:
+                    f.write(instrument.output_html())
+                print(instrument.output_text(unicode=True, color=False))
+                print(f"✓ Wrote {output}.html")
+
+    import cProfile
+    import pstats
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(func)
+    finally:
+        profile.dump_stats(output + '.prof')
+        pstats.Stats(profile).sort_stats('cumulative').print_stats(25)
+        print(f"✓ Wrote {output}.prof")
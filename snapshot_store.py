@@ -0,0 +1,46 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+
+class SnapshotStore:
+    """
+    Compressed snapshots of processed pages for offline re-extraction.
+    One gzip-compressed JSON file per URL (named by a hash of the URL) holds
+    the rendered DOM or raw HTML, the raw title, the harvested image payload
+    and the image URLs that were accepted, so title rules and image filters
+    can be re-run later without a browser. Saving the same URL again
+    replaces its snapshot.
+    """
+
+    def __init__(self, folder='.snapshots', level=6):
+        self.folder = folder
+        self.level = level
+        os.makedirs(folder, exist_ok=True)
+
+    def path_for(self, url):
+        return os.path.join(self.folder, hashlib.sha1(url.encode('utf-8')).hexdigest()[:20] + '.json.gz')
+
+    def save(self, snapshot):
+        """Write snapshot (a dict with at least 'url') atomically; returns the compressed size"""
+        snapshot = dict(snapshot, captured_at=round(time.time(), 3))
+        data = gzip.compress(json.dumps(snapshot, ensure_ascii=False).encode('utf-8'), self.level)
+        path = self.path_for(snapshot['url'])
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        return len(data)
+
+    def paths(self):
+        """Paths of all stored snapshots"""
+        return sorted(os.path.join(self.folder, name) for name in os.listdir(self.folder)
+                      if name.endswith('.json.gz'))
+
+    def __len__(self):
+        return len(self.paths())
+
+def load_snapshot(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
@@ -0,0 +1,156 @@
+import json
+import re
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+# Upper bound on the image URLs taken from one page, each costs a download
+MAX_STATIC_CANDIDATES = 40
+
+# Absolute image URLs inside inline scripts, also with JSON-escaped slashes
+_SCRIPT_IMAGE_URL = re.compile(r'https?:(?:\\?/){2}[^\s"\'<>]+?\.(?:jpe?g|png|webp|avif)(?:\?[^\s"\'<>\\]*)?', re.I)
+
+# <meta> properties naming the page's share image
+_META_IMAGES = {'og:image', 'og:image:url', 'og:image:secure_url', 'twitter:image'}
+
+# <img> attributes lazy-loading galleries keep the real source in
+_LAZY_ATTRIBUTES = ('data-src', 'data-lazy-src', 'data-original', 'data-lazy')
+
+class _PageParser(HTMLParser):
+    """Collects the title, meta tags, scripts and <img> sources of a static page"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ''
+        self.meta = {}
+        self.json_ld = []
+        self.scripts = []
+        self.images = []        # (url, width attribute, height attribute)
+        self._in_title = False
+        self._script = None     # 'ld' or 'inline' while inside a script without src
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {name: value or '' for name, value in attrs}
+        if tag == 'title':
+            self._in_title = True
+        elif tag == 'meta':
+            key = (attrs.get('property') or attrs.get('name') or '').lower()
+            if key and key not in self.meta and attrs.get('content'):
+                self.meta[key] = attrs['content'].strip()
+        elif tag == 'script' and not attrs.get('src'):
+            self._script = 'ld' if attrs.get('type', '').lower() == 'application/ld+json' else 'inline'
+            (self.json_ld if self._script == 'ld' else self.scripts).append('')
+        elif tag in ('img', 'source'):
+            url = largest_srcset_url(attrs.get('srcset') or attrs.get('data-srcset'))
+            url = url or next((attrs[name] for name in _LAZY_ATTRIBUTES if attrs.get(name)), None) or attrs.get('src')
+            if url:
+                self.images.append((url.strip(), _pixels(attrs.get('width')), _pixels(attrs.get('height'))))
+
+    def handle_endtag(self, tag):
+        if tag == 'title':
+            self._in_title = False
+        elif tag == 'script':
+            self._script = None
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif self._script == 'ld':
+            self.json_ld[-1] += data
+        elif self._script == 'inline':
+            self.scripts[-1] += data
+
+def _pixels(value):
+    """Integer value of a width/height attribute, 0 if missing or relative"""
+    value = (value or '').strip().lower().removesuffix('px')
+    return int(value) if value.isdigit() else 0
+
+def largest_srcset_url(srcset):
+    """URL of the widest (or highest density) variant of a srcset attribute, None if empty"""
+    best, best_size = None, -1.0
+    for part in re.split(r',\s+', srcset or ''):
+        pieces = part.strip().split()
+        if not pieces:
+            continue
+        descriptor = pieces[1] if len(pieces) > 1 else '1x'
+        try:
+            size = float(descriptor[:-1]) * (1 if descriptor.endswith('w') else 10000)
+        except ValueError:
+            size = 0.0
+        if size > best_size:
+            best, best_size = pieces[0], size
+    return best
+
+def _json_ld_values(data, images, addresses):
+    """Walk a JSON-LD document for image URLs and postal addresses"""
+    if isinstance(data, list):
+        for item in data:
+            _json_ld_values(item, images, addresses)
+    elif isinstance(data, dict):
+        if data.get('streetAddress'):
+            locality = f"{data.get('postalCode', '')} {data.get('addressLocality', '')}".strip()
+            addresses.append(f"{data['streetAddress']}, {locality}" if locality else data['streetAddress'])
+        for key, value in data.items():
+            if key in ('image', 'photo', 'contentUrl', 'associatedMedia'):
+                _json_ld_images(value, images)
+            elif isinstance(value, (dict, list)):
+                _json_ld_values(value, images, addresses)
+
+def _json_ld_images(value, images):
+    if isinstance(value, str):
+        images.append(value)
+    elif isinstance(value, list):
+        for item in value:
+            _json_ld_images(item, images)
+    elif isinstance(value, dict):
+        url = value.get('contentUrl') or value.get('url')
+        if isinstance(url, str):
+            images.append(url)
+
+def parse_static_page(html, page_url):
+    """
+    Extract what the scraper needs from the raw HTML of a listing page.
+    Returns a dict with 'titles', the title candidates in order of preference
+    (<title>, og:title, JSON-LD addresses), and 'images', the image candidates
+    as {'src', 'kind'} dicts with absolute URLs. Images come from og:image,
+    JSON-LD, URLs embedded in inline scripts and <img> tags (the largest
+    srcset variant or the lazy-load attribute); icons with a declared size
+    below 400px, SVGs and data: URLs are left out.
+    """
+    parser = _PageParser()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:
+        # Keep whatever was parsed before the broken markup
+        pass
+
+    titles = [re.sub(r'\s+', ' ', title).strip() for title in (parser.title, parser.meta.get('og:title', ''))]
+    found = [(parser.meta[key], 'og') for key in sorted(_META_IMAGES) if key in parser.meta]
+    addresses = []
+    for text in parser.json_ld:
+        try:
+            data = json.loads(text)
+        except ValueError:
+            continue
+        images = []
+        _json_ld_values(data, images, addresses)
+        found += [(image, 'json-ld') for image in images]
+    for text in parser.scripts:
+        found += [(match.replace('\\/', '/'), 'script') for match in _SCRIPT_IMAGE_URL.findall(text)]
+    for url, width, height in parser.images:
+        if width and height and max(width, height) < 400:
+            continue
+        found.append((url, 'img'))
+
+    candidates = []
+    seen = set()
+    for url, kind in found:
+        if not url or url.startswith('data:'):
+            continue
+        src = urljoin(page_url, url)
+        if src in seen or src.split('?')[0].lower().endswith('.svg'):
+            continue
+        seen.add(src)
+        candidates.append({'src': src, 'kind': kind})
+    return {'titles': [title for title in titles + addresses if title],
+            'images': candidates[:MAX_STATIC_CANDIDATES]}